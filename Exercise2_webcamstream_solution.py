@@ -3,34 +3,43 @@ Exercise2 : Solution
 
 """
 import cv2
-import numpy as np
-import matplotlib
-
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-
-plt.style.use('dark_background')  # Dark background for a prettier plot
+from asppsamples.webcam.threadedcapture import ThreadedCapture
+from asppsamples.webcam.tracerenderer import TraceRenderer, setup_pyplot
+from asppsamples.webcam.renderscheduler import RenderScheduler
+from asppsamples.ringbuffer import RingSeries
+from asppsamples.webcam.imageintensity import IntensityEngine
+from asppsamples.webcam.colorconversion import bgr_to_rgb_view
 
 
 def display_images():
     """
     This function obtains results from generators and plot image and image intensity
     """
+    plt = setup_pyplot()  # TkAgg with a dark background for a prettier plot
     vc = cv2.VideoCapture(0)  # Open webcam using opencv 0 = First available camera
+    vc = ThreadedCapture(vc, maxsize=4, overflow='drop-oldest')  # Read camera on a background thread
     figure, ax = plt.subplots(1, 2, figsize=(10, 5))
 
     count = 0
-    intensity = []
+    intensity = RingSeries(capacity=200)  # Intensity of the last 200 frames
     g = stream_frames(vc)
+    renderer = None
 
     for i in g:
         # i[0] : rgb image
         # i[1] : intensity of image
         intensity.append(i[1])
-        plot_image_and_brightness(axis=ax, image=i[0], imageintensity=intensity, framecount=count)
+        if renderer is None:  # Create the image and trace artists with the first frame
+            renderer = TraceRenderer(imageaxis=ax[0], traceaxis=ax[1], image=i[0], threshold=None)
+            # Every frame is analyzed, the newest one is drawn at most 30 times a second
+            scheduler = RenderScheduler(lambda **state: plot_image_and_brightness(renderer=renderer, **state),
+                                        fps=30)
+            plt.show(block=False)
+        scheduler.update(image=i[0], imageintensity=intensity, framecount=count)
         count += 1
         if cv2.waitKey(1) & 0xFF == ord('q'):
             # Clean up if q is pressed
+            scheduler.report()
             plt.close('all')
             g.close()
             break
@@ -43,38 +52,33 @@ def stream_frames(video_capture):
     :yield  RGB_image
             Image Intensity
     """
+    engine = IntensityEngine(mode='exact')
     try:
         while True:
-            _, frame = video_capture.read()  # Read image from webcam
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # Convert to rgb
-            intensity = np.mean(rgb)  # Get mean intensity
+            ret, frame = video_capture.read()  # Read image from webcam
+            if not ret:  # Camera failed or the source ended
+                return
+            intensity = engine(frame)  # Get mean intensity, channel order does not matter for the mean
+            rgb = bgr_to_rgb_view(frame)  # Convert to rgb for plotting, a view without copying
             yield rgb, intensity
-    except GeneratorExit:
+    finally:  # Closed by the caller or out of frames
         print('Closing Cameras')
         video_capture.release()
+        if hasattr(video_capture, 'print_stats'):
+            video_capture.print_stats()
 
 
-def plot_image_and_brightness(axis, image, imageintensity, framecount):
+def plot_image_and_brightness(renderer, image, imageintensity, framecount):
     """
     This function plots image and intensity of image through time
-    :param  axis: figure axis for plotting
+    The artists are created once by the TraceRenderer and only their data is changed here
+    :param  renderer: TraceRenderer holding the image and trace artists
             image: rgb image
-            imageintensity: intensity of image
+            imageintensity: RingSeries with the intensity of image
             framecount: present frame number
     """
-
-    # Plot RGB image
-    axis[0].imshow(image)
-    axis[0].axis('off')
-    axis[0].set_title(f'Frame Number {framecount}')
-
-    # Plot intensity
-    axis[1].plot(imageintensity, '.-')
-    axis[1].set_ylabel('Average Intensity')
-
-    # Stuff to show and stream plot
-    plt.show(block=False)
-    plt.pause(0.001)
+    renderer.update(series=imageintensity, image=image, title=f'Frame Number {framecount}')
 
 
-display_images()
+if __name__ == '__main__':
+    display_images()
@@ -0,0 +1,26 @@
+"""
+The webcam and twitter samples as one importable package
+    asppsamples.webcam   - capture, frame sources, intensity, motion, rendering, recording, headless runs
+    asppsamples.twitter  - feed readers, cache, location and hashtag counts, maps, sentiment, sink, replay
+
+Importing the package or a subpackage imports nothing heavy. Every name is imported from its module the
+first time it is used, so `from asppsamples.webcam import stream_frames` loads cv2 but not matplotlib,
+and opens no camera or window. The modules themselves live in the subpackages, for example
+asppsamples.webcam.ringbuffer; the scripts at the top of the repository import them from there.
+
+python -m asppsamples.startup checks the import time of the package and the scripts against a budget.
+"""
+import importlib
+
+__version__ = '0.1.0'
+_SUBPACKAGES = ('webcam', 'twitter')
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBPACKAGES))
@@ -0,0 +1,29 @@
+"""
+Lazy names for the subpackages
+"""
+import importlib
+import sys
+
+
+def attach(package, exports):
+    """
+    Make the names of other modules available from a package, importing each module on first use
+    :param package: __name__ of the package
+    :param exports: dictionary of module name: list of the names it provides. Module names starting with a dot
+                    are relative to the package
+    :return: __getattr__, __dir__ and __all__ for the package
+    """
+    where = {name: module for module, names in exports.items() for name in names}
+
+    def __getattr__(name):
+        module = where.get(name)
+        if module is None:
+            raise AttributeError(f'module {package!r} has no attribute {name!r}')
+        value = getattr(importlib.import_module(module, package), name)
+        setattr(sys.modules[package], name, value)  # Found directly from now on
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(where))
+
+    return __getattr__, __dir__, sorted(where)
@@ -0,0 +1,125 @@
+"""
+Fixed capacity time series for the rolling intensity history of the webcam scripts
+Values are stored twice in NumPy arrays of twice the capacity, so the newest `capacity` samples are
+always one contiguous slice. Reading the history in order is a view, and appending never allocates.
+"""
+import numpy as np
+
+
+class RingSeries:
+    def __init__(self, capacity, dtype=np.float64):
+        """
+        :param capacity: number of samples kept, older samples are overwritten
+        :param dtype: dtype of the values
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = int(capacity)
+        self.total = 0  # number of samples appended since the start
+
+        self._x = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._y = np.zeros(2 * self.capacity, dtype=dtype)
+        self._head = 0  # position of the next write
+
+        # Output buffers for the threshold masks
+        self._mask = np.zeros(self.capacity, dtype=bool)
+        self._below = np.empty(self.capacity, dtype=np.float64)
+        self._above = np.empty(self.capacity, dtype=np.float64)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, y, x=None):
+        """
+        Add a sample
+        :param y: value, for example the intensity of a frame
+        :param x: time of the sample, defaults to the number of samples appended before this one
+        """
+        if x is None:
+            x = self.total
+        h = self._head
+        self._x[h] = self._x[h + self.capacity] = x
+        self._y[h] = self._y[h + self.capacity] = y
+        self._head = (h + 1) % self.capacity
+        self.total += 1
+
+    def clear(self):
+        self.total = 0
+        self._head = 0
+
+    def _window(self):
+        if self.total < self.capacity:
+            return slice(0, self.total)
+        return slice(self._head, self._head + self.capacity)
+
+    @property
+    def x(self):
+        """
+        Sample times, oldest first. This is a view that changes with the next append
+        """
+        return self._x[self._window()]
+
+    @property
+    def y(self):
+        """
+        Sample values, oldest first. This is a view that changes with the next append
+        """
+        return self._y[self._window()]
+
+    def summary_ms(self, percentiles=(50, 90, 99), mean=True, maximum=False):
+        """
+        Percentiles of values in seconds, such as latencies, in milliseconds
+        :param percentiles: percentiles to report, as keys 'p50', 'p90', ...
+        :param mean: add the mean as 'mean'
+        :param maximum: add the largest value as 'max'
+        :return: dictionary of milliseconds, empty if there are no samples
+        """
+        values = self.y
+        if not len(values):
+            return {}
+        p = np.percentile(values, percentiles) * 1000
+        s = {f'p{q}': float(v) for q, v in zip(percentiles, p)}
+        if mean:
+            s['mean'] = float(values.mean() * 1000)
+        if maximum:
+            s['max'] = float(values.max() * 1000)
+        return s
+
+    def last(self):
+        """
+        :return: the newest value
+        """
+        if not self.total:
+            raise IndexError('last from an empty RingSeries')
+        return self._y[self._head - 1 + self.capacity]
+
+    def below(self, threshold):
+        """
+        :param threshold: intensity threshold
+        :return: boolean mask of the samples below threshold, in a reused buffer
+        """
+        return np.less(self.y, threshold, out=self._mask[:len(self)])
+
+    def split(self, threshold):
+        """
+        Split the values at a threshold for plotting in two colours.
+        Samples on the other side of the threshold are NaN, which matplotlib leaves as gaps.
+        Both arrays are reused buffers, they change with the next call
+        :param threshold: intensity threshold
+        :return: below: values below threshold
+                 above: values above threshold
+        """
+        n = len(self)
+        y = self.y
+        mask = self._mask[:n]
+        below = self._below[:n]
+        above = self._above[:n]
+
+        np.less(y, threshold, out=mask)
+        below.fill(np.nan)
+        np.copyto(below, y, where=mask)
+
+        np.greater(y, threshold, out=mask)
+        above.fill(np.nan)
+        np.copyto(above, y, where=mask)
+        return below, above
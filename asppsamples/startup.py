@@ -0,0 +1,121 @@
+"""
+Import time budget of the package and the scripts
+Every module is imported in a fresh interpreter, a few times, and the fastest import is compared with
+its budget. The modules each import must leave alone are checked too: importing the package loads
+nothing heavy, and importing a script does not pick a matplotlib backend or import tweepy.
+
+    python -m asppsamples.startup               # table of every module, exit status 1 when over budget
+    python -m asppsamples.startup --scale 3     # three times the budget, for slow machines
+
+tests/test_startup.py runs the same check under pytest.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Folder of the package and the scripts
+
+LIGHT = ('cv2', 'numpy', 'matplotlib', 'toolz', 'tweepy', 'pandas', 'textblob')
+NO_DISPLAY = ('matplotlib', 'tkinter', 'tweepy', 'mpl_toolkits')
+
+# module: (seconds to import in a fresh interpreter, modules it must not import)
+BUDGETS = {
+    'asppsamples': (0.05, LIGHT),
+    'asppsamples.webcam': (0.05, LIGHT),
+    'asppsamples.twitter': (0.05, LIGHT),
+    'asppsamples.startup': (0.05, LIGHT),
+    'asppsamples.webcam.toolzstream': (1.0, NO_DISPLAY),
+    'asppsamples.webcam.headless': (1.0, NO_DISPLAY),
+    'asppsamples.webcam.webcamstream': (1.0, NO_DISPLAY),
+    'asppsamples.twitter.twitterstreamsample': (0.5, NO_DISPLAY),
+    'asppsamples.twitter.tweetreplay': (0.5, NO_DISPLAY),
+    'asppsamples.twitter.tweetmap': (0.5, NO_DISPLAY),
+    'asppsamples.twitter.sentimentengine': (0.5, ('pandas', 'textblob') + NO_DISPLAY),
+    # Scripts at the top of the repository, skipped when only the package is installed
+    'WebcamStreamwithToolz': (1.0, NO_DISPLAY),
+    'webcamstream': (1.0, NO_DISPLAY),
+    'twitterstreamsample': (0.5, NO_DISPLAY),
+    'Exercise2_webcamstream_solution': (1.0, NO_DISPLAY),
+    'updateplotcolors_withbrightness': (1.0, NO_DISPLAY),
+    'Exercise2_webcam_getoneframe': (1.0, NO_DISPLAY),
+}
+
+_PROBE = """
+import sys, time, json
+starttime = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - starttime
+print(json.dumps([seconds, sorted(sys.modules)]))
+"""
+
+
+def measure_import(module, repeat=3):
+    """
+    :param module: module name
+    :param repeat: number of fresh interpreters, the fastest counts
+    :return: seconds to import the module, set of the modules loaded by then
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    best, loaded = None, set()
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)], env=env, cwd=ROOT,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ImportError(f'Importing {module} failed:\n{result.stderr.strip()}')
+        seconds, modules = json.loads(result.stdout.splitlines()[-1])
+        if best is None or seconds < best:
+            best, loaded = seconds, set(modules)
+    return best, loaded
+
+
+def check_startup(budgets=None, scale=1.0, repeat=3):
+    """
+    :param budgets: dictionary of module: (seconds, modules it must not import), None for BUDGETS
+    :param scale: factor on every time budget
+    :param repeat: imports of each module, the fastest counts
+    :return: list of dictionaries with module, seconds, budget, the forbidden modules it loaded and ok.
+             seconds is None when the module could not be imported here (a missing dependency)
+    """
+    results = []
+    for module, (budget, forbidden) in (budgets or BUDGETS).items():
+        try:
+            seconds, loaded = measure_import(module, repeat)
+        except ImportError as e:
+            results.append({'module': module, 'seconds': None, 'budget': budget * scale, 'loaded': [],
+                            'ok': None, 'error': str(e).splitlines()[-1]})
+            continue
+        heavy = sorted(m for m in forbidden if m in loaded)
+        results.append({'module': module, 'seconds': seconds, 'budget': budget * scale, 'loaded': heavy,
+                        'ok': seconds <= budget * scale and not heavy})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the import time of the package and the scripts')
+    parser.add_argument('--scale', type=float, default=1.0, help='factor on every time budget')
+    parser.add_argument('--repeat', type=int, default=3, help='imports of each module, the fastest counts')
+    parser.add_argument('--json', default=None, help='file to write the results to')
+    args = parser.parse_args(argv)
+
+    results = check_startup(scale=args.scale, repeat=args.repeat)
+    print('{:>34}{:>10}{:>10}  {}'.format('module', 'ms', 'budget', 'result'))
+    for r in results:
+        if r['seconds'] is None:
+            print('{:>34}{:>10}{:10.0f}  skipped, {}'.format(r['module'], '-', r['budget'] * 1000, r['error']))
+            continue
+        result = 'ok' if r['ok'] else 'OVER BUDGET' if not r['loaded'] else 'imports ' + ', '.join(r['loaded'])
+        print('{:>34}{:10.1f}{:10.0f}  {}'.format(r['module'], r['seconds'] * 1000, r['budget'] * 1000, result))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+    failed = [r['module'] for r in results if r['ok'] is False]
+    if failed:
+        print('Over budget: ' + ', '.join(failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""
+Twitter feed recording and analysis, imported on first use
+"""
+from asppsamples._lazy import attach
+
+_EXPORTS = {
+    '.tweetfeed': ['get_twitter_data', 'get_userlocation', 'get_xy', 'get_text', 'get_hashtags'],
+    '.tweetcache': ['TweetCache', 'build_cache', 'open_cache', 'read_column'],
+    '.locationmatcher': ['LocationMatcher', 'count_tweets_by_location'],
+    '.parallelcsv': ['ChunkedCSV', 'iter_rows', 'map_reduce', 'count_tweets'],
+    '.tweetmap': ['LiveTweetMap', 'TailFollower', 'DensityGrid', 'plot_on_map', 'create_map'],
+    '.sentimentengine': ['SentimentEngine', 'get_tweet_sentiment'],
+    '.hashtagcounter': ['SpaceSaving', 'count_hashtags', 'encode_hashtags', 'parse_hashtags'],
+    '.tweetwindows': ['WindowAggregator', 'window_counts'],
+    '.tweetsink': ['BufferedCSVSink'],
+    '.tweetreplay': ['ReplayStream', 'StatusFactory'],
+    '.twitterstreamsample': ['StdOutListener', 'tweepy_listener'],
+}
+
+__getattr__, __dir__, __all__ = attach(__name__, _EXPORTS)
@@ -0,0 +1,140 @@
+"""
+Hashtags stored as json and counted with a bounded-memory top-K counter
+At ingest the hashtags of a tweet are written to the csv as a json list of their texts, ["python", "ASPP"],
+which survives commas and quotes in the csv and is read back with one json.loads. Files written before
+hold the python repr of tweepy's entities list, [{'text': 'python', 'indices': [0, 7]}], and are still read.
+
+SpaceSaving keeps the k most frequent hashtags of a stream of any length in memory for k entries.
+Counts of items that were in the list from the start are exact, the error of any count is at most the
+smallest count in the list, and any hashtag more frequent than total / k is guaranteed to be in it.
+
+    counter = count_hashtags(get_hashtags(get_twitter_data('twitterfeed.csv')), k=200)
+    counter.top(10)                                       # trending list
+    WordCloud().generate_from_frequencies(counter.counts())
+"""
+import ast
+import heapq
+import itertools
+import json
+import re
+
+_LEGACY_TEXT = re.compile(r"""['"]text['"]\s*:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")""")
+
+
+def encode_hashtags(hashtags):
+    """
+    :param hashtags: status.entities['hashtags'], list of dictionaries with a 'text' entry, or list of texts
+    :return: json list of the hashtag texts, for the Hashtag column of the csv
+    """
+    texts = [h['text'] if isinstance(h, dict) else str(h) for h in hashtags or []]
+    return json.dumps(texts, ensure_ascii=False)
+
+
+def parse_hashtags(cell):
+    """
+    :param cell: Hashtag column of one row, json list or the older repr of the entities list
+    :return: list of hashtag texts
+    """
+    if not cell:
+        return []
+    try:
+        value = json.loads(cell)
+    except ValueError:
+        try:
+            value = ast.literal_eval(cell)
+        except (ValueError, SyntaxError):
+            # Cut off or otherwise broken repr, take whatever 'text' entries can be found
+            return [a or b for a, b in _LEGACY_TEXT.findall(cell)]
+    if not isinstance(value, list):
+        return []
+    return [h['text'] if isinstance(h, dict) else str(h) for h in value if not isinstance(h, dict) or 'text' in h]
+
+
+class SpaceSaving:
+    def __init__(self, k=100):
+        """
+        Approximate counts of the k most frequent items of a stream (Metwally et al., Space-Saving)
+        :param k: number of items tracked
+        """
+        if k < 1:
+            raise ValueError('k must be at least 1')
+        self.k = k
+        self.total = 0  # number of items counted
+        self._counts = {}
+        self._errors = {}  # overestimate of each count, from the item it replaced
+        self._heap = []  # (count, seq, item) entries, the smallest count is evicted. Old entries are skipped
+        self._seq = itertools.count()  # breaks ties between equal counts, items are never compared
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, item):
+        return item in self._counts
+
+    def _push(self, item):
+        heapq.heappush(self._heap, (self._counts[item], next(self._seq), item))
+        if len(self._heap) > 4 * self.k:  # Drop the out of date entries now and then
+            self._heap = [(count, next(self._seq), item) for item, count in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self):
+        """
+        :return: smallest count, after removing its item
+        """
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            if self._counts.get(item) == count:
+                del self._counts[item]
+                del self._errors[item]
+                return count
+
+    def update(self, item, count=1):
+        self.total += count
+        if item in self._counts:
+            self._counts[item] += count
+        elif len(self._counts) < self.k:
+            self._counts[item] = count
+            self._errors[item] = 0
+        else:
+            # Take over the slot of the least frequent item, assuming item might have been counted as often
+            smallest = self._evict()
+            self._counts[item] = smallest + count
+            self._errors[item] = smallest
+        self._push(item)
+
+    def update_many(self, items):
+        for item in items:
+            self.update(item)
+
+    def top(self, n=None):
+        """
+        :param n: number of items, None for all k
+        :return: list of (item, count, error) with the largest counts first, equal counts in the order
+                 the items were first counted. The true count is between count - error and count
+        """
+        ranked = sorted(self._counts.items(), key=lambda entry: -entry[1])
+        return [(item, count, self._errors[item]) for item, count in ranked[:n]]
+
+    def counts(self):
+        """
+        :return: dictionary of item: count, for WordCloud.generate_from_frequencies
+        """
+        return dict(self._counts)
+
+
+def count_hashtags(array_iter, k=100, casefold=True, counter=None):
+    """
+    Count hashtags without keeping them all in memory
+    :param  array_iter: iterable of Hashtag column values, header first, for example get_hashtags(...)
+            k: number of hashtags tracked
+            casefold: count #Python and #python as the same hashtag
+            counter: SpaceSaving to add to, None makes a new one
+    :return SpaceSaving counter
+    """
+    if counter is None:
+        counter = SpaceSaving(k)
+    for i, arr in enumerate(array_iter):
+        if i > 0:  # Skip header row
+            for tag in parse_hashtags(arr):
+                counter.update(tag.casefold() if casefold else tag)
+    return counter
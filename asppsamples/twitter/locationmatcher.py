@@ -0,0 +1,172 @@
+"""
+Match tweet locations against many countries, regions and city aliases at once
+All names are compiled into one regular expression shaped like a prefix tree (a small automaton), so every
+location string is scanned a single time no matter how many names there are, instead of one str.find per name.
+Names can be aliases of a region, {'USA': ['USA', 'United States', 'New York'], 'UK': ['UK', 'London']}
+counts a tweet from 'London, England' for 'UK'.
+
+    matcher = LocationMatcher(['USA', 'India', 'UK', 'Australia'])
+    matcher.count(get_userlocation(get_twitter_data('twitterfeed.csv')))      # row by row
+    matcher.count_column(read_column('twitterfeed.csv', 'UserLocation'))    # whole column in one scan
+"""
+import re
+
+import numpy as np
+
+SEPARATOR = '\x00'  # Between rows in count_column, never part of a name
+
+
+def _trie_regex(names):
+    """
+    Regular expression that matches the longest of the names, written as a prefix tree so the regex engine
+    follows one branch per character instead of trying every name in turn: ['UK', 'USA', 'US'] gives U(?:K|S(?:A)?)
+    """
+    trie = {}
+    for name in names:
+        node = trie
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[''] = True  # A name ends here
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        pattern = '(?:' + '|'.join(branches) + ')' if len(branches) > 1 else branches[0]
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'  # Greedy, so the longer name is tried first
+        return pattern
+
+    return build(trie)
+
+
+class LocationMatcher:
+    def __init__(self, regions, ignore_case=False):
+        """
+        :param regions: list of names, each its own region, or
+                        dictionary of region: list of names (aliases) that count for that region
+        :param ignore_case: match names regardless of upper and lower case
+        """
+        if isinstance(regions, dict):
+            aliases = {region: list(names) for region, names in regions.items()}
+        else:
+            aliases = {region: [region] for region in regions}
+        self.regions = list(aliases)
+        self.ignore_case = ignore_case
+
+        def key(name):
+            return name.lower() if ignore_case else name
+
+        # Every name maps to the indices of the regions it counts for
+        names = {}
+        for r, region in enumerate(self.regions):
+            for name in aliases[region]:
+                if not name or SEPARATOR in name:
+                    raise ValueError(f'Invalid name {name!r} for region {region!r}')
+                names.setdefault(key(name), set()).add(r)
+
+        # The lookahead finds a match at every position, and with the longest names first it is the
+        # longest name starting there. Any other name found in the text is either that match or a part of it,
+        # so each match also counts the regions of every name it contains.
+        ordered = sorted(names, key=len, reverse=True)
+        self._hits = {}
+        for name in ordered:
+            hits = set()
+            for other in ordered:
+                if other in name:
+                    hits |= names[other]
+            self._hits[name] = frozenset(hits)
+        flags = re.IGNORECASE if ignore_case else 0
+        self._pattern = re.compile('(?=(' + _trie_regex(ordered) + '))', flags)
+        self._key = key
+
+    def match(self, location):
+        """
+        :param location: location string of one tweet
+        :return: set of region indices found in the location
+        """
+        found = set()
+        for m in self._pattern.finditer(location):
+            found |= self._hits[self._key(m.group(1))]
+        return found
+
+    def regions_of(self, location):
+        """
+        :return: list of region names found in the location, in the order of regions
+        """
+        return [self.regions[r] for r in sorted(self.match(location))]
+
+    def count(self, locations, skip_header=True):
+        """
+        Count the tweets from every region, a tweet counts once per region however many aliases it contains
+        :param locations: iterable of location strings, for example get_userlocation(...)
+        :param skip_header: the first item is the column name
+        :return: dictionary of region: number of tweets, total number of tweets
+        """
+        counts = [0] * len(self.regions)
+        total = 0
+        locations = iter(locations)
+        if skip_header:
+            next(locations, None)
+        for location in locations:
+            total += 1
+            for r in self.match(location):
+                counts[r] += 1
+        return dict(zip(self.regions, counts)), total
+
+    def match_column(self, locations):
+        """
+        Vectorized mode: join a whole column into one string and scan it once
+        :param locations: list or iterable of location strings, without the header
+        :return: boolean array of shape (number of tweets, number of regions)
+        """
+        locations = [location.replace(SEPARATOR, ' ') for location in locations]
+        found = np.zeros((len(locations), len(self.regions)), dtype=bool)
+        if not locations:
+            return found
+        starts = np.zeros(len(locations), dtype=np.int64)
+        np.cumsum([len(location) + 1 for location in locations[:-1]], out=starts[1:])
+
+        positions, names = [], []
+        for m in self._pattern.finditer(SEPARATOR.join(locations)):
+            positions.append(m.start())
+            names.append(m.group(1))
+        if not positions:
+            return found
+        rows = np.searchsorted(starts, positions, side='right') - 1  # Row each match starts in
+
+        # One entry per distinct matched name, then set all its regions for the rows it was found in
+        names = np.array([self._key(name) for name in names])
+        for name in np.unique(names):
+            hitrows = rows[names == name]
+            for r in self._hits[name]:
+                found[hitrows, r] = True
+        return found
+
+    def count_column(self, locations, skip_header=True):
+        """
+        Same as count, in one scan of the whole column
+        :param locations: iterable of location strings, for example read_column(csv_fname, 'UserLocation')
+        :param skip_header: the first item is the column name
+        :return: dictionary of region: number of tweets, total number of tweets
+        """
+        locations = list(locations)
+        if skip_header:
+            locations = locations[1:]
+        found = self.match_column(locations)
+        return dict(zip(self.regions, found.sum(axis=0).tolist())), len(locations)
+
+
+def count_tweets_by_location(array_iter, countrylist, ignore_case=False):
+    """
+    Count tweets from multiple locations, scanning every location once for all countries
+    :param  array_iter: iterable of location strings, header first
+            countrylist: list of countries, or dictionary of region: list of aliases
+            ignore_case: match names regardless of upper and lower case
+    :return: dictionary of country: number of tweets
+    """
+    countdict, _ = LocationMatcher(countrylist, ignore_case=ignore_case).count(array_iter)
+
+    print('done searching')
+    print(countdict)
+    return countdict
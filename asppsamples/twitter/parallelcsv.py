@@ -0,0 +1,274 @@
+"""
+Parallel chunked reading of large twitter feed csv files
+The file is cut into byte ranges of about chunksize bytes and every range is parsed by a worker process.
+A cut usually lands in the middle of a row, so each range starts after the first newline past its cut that
+is not inside a quoted field. Whether a position is inside quotes follows from the number of quote characters
+before it (csv writes a quote inside a field as two quotes, so an odd count means inside), and the workers
+count the quotes of every range first so no process has to scan the whole file.
+
+    iter_rows(csv_fname)                    - rows in file order, header first, same as get_twitter_data
+    map_reduce(csv_fname, mapper, reducer)  - mapper(rows) runs on every chunk in a worker, reducer merges
+    count_tweets, count_tweets_by_location  - the notebook counts as map-reduce jobs
+
+The mapper runs in the worker processes, so it has to be picklable (a module level function or a
+functools.partial of one).
+"""
+import csv
+import functools
+import io
+import multiprocessing as mp
+import os
+from collections import deque
+
+CHUNKSIZE = 16 * 1024 * 1024
+LOCATION_COLUMN = 2  # UserLocation
+
+
+def _count_quotes(csv_fname, start, end, blocksize=1 << 20):
+    """
+    :return: number of quote characters between byte start and end
+    """
+    count = 0
+    with open(csv_fname, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(blocksize, remaining))
+            if not block:
+                break
+            count += block.count(b'"')
+            remaining -= len(block)
+    return count
+
+
+def _row_start(f, offset, inquote, size, blocksize=1 << 16):
+    """
+    Find the first row that starts at or after offset
+    :param f: csv file opened in binary mode
+    :param offset: byte position, 0 is the start of the file
+    :param inquote: True if offset is inside a quoted field, None if offset is known to be the start of a row
+    :param size: file size in bytes
+    :return: byte position just after the first newline outside quotes, at or after offset (size if none)
+    """
+    if inquote is None:
+        return offset
+    if offset >= size:
+        return size
+    f.seek(offset)
+    position = offset
+    while True:
+        block = f.read(blocksize)
+        if not block:
+            return size
+        i = 0
+        while True:
+            quote = block.find(b'"', i)
+            newline = -1 if inquote else block.find(b'\n', i)  # Newlines inside quotes are part of a field
+            if newline >= 0 and (quote < 0 or newline < quote):
+                return position + newline + 1
+            if quote < 0:
+                break
+            inquote = not inquote
+            i = quote + 1
+        position += len(block)
+
+
+def _parse_range(csv_fname, start, startquote, end, endquote, size):
+    """
+    Parse the rows that start inside the byte range [start, end)
+    :return: list of rows
+    """
+    with open(csv_fname, 'rb') as f:
+        rowstart = _row_start(f, start, startquote, size)
+        rowend = _row_start(f, end, endquote, size)
+        if rowend <= rowstart:
+            return []
+        f.seek(rowstart)
+        text = f.read(rowend - rowstart).decode('utf-8')
+    return list(csv.reader(io.StringIO(text, newline='')))
+
+
+def _count_quotes_task(args):
+    return _count_quotes(*args)
+
+
+def _chunk_task(task):
+    mapper, args = task
+    rows = _parse_range(*args)
+    return rows if mapper is None else mapper(rows)
+
+
+class ChunkedCSV:
+    def __init__(self, csv_fname, nworkers=None, chunksize=CHUNKSIZE, context=None):
+        """
+        :param csv_fname: csv file with a header row
+        :param nworkers: number of worker processes, None for one per cpu, 0 to parse in this process
+        :param chunksize: bytes per chunk
+        :param context: multiprocessing start method ('fork', 'spawn', 'forkserver'), None for the default
+        """
+        self.csv_fname = csv_fname
+        self.nworkers = os.cpu_count() if nworkers is None else nworkers
+        self.chunksize = max(1, int(chunksize))
+        self.ctx = mp.get_context(context)
+        self.size = os.path.getsize(csv_fname)
+
+        with open(csv_fname, 'rb') as f:
+            self.datastart = _row_start(f, 0, False, self.size)  # End of the header row
+            f.seek(0)
+            header = f.read(self.datastart).decode('utf-8')
+        self.header = next(csv.reader(io.StringIO(header, newline='')), [])
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _map(self, func, items):
+        """
+        Ordered map over the worker pool, with at most two items per worker in flight
+        """
+        if not self.nworkers:
+            yield from map(func, items)
+            return
+        if self.pool is None:
+            self.pool = self.ctx.Pool(self.nworkers)
+        inflight = deque()
+        for item in items:
+            inflight.append(self.pool.apply_async(func, (item,)))
+            if len(inflight) >= 2 * self.nworkers:
+                yield inflight.popleft().get()
+        while inflight:
+            yield inflight.popleft().get()
+
+    def ranges(self):
+        """
+        Byte ranges of the chunks, with the quote state at each end
+        :return: list of (csv_fname, start, startquote, end, endquote, size) arguments for _parse_range
+        """
+        cuts = list(range(self.datastart, self.size, self.chunksize)) + [self.size]
+        spans = list(zip(cuts[:-1], cuts[1:]))
+        quotes = list(self._map(_count_quotes_task, [(self.csv_fname, start, end) for start, end in spans]))
+
+        # Quote state at every cut, from the running count of quotes since the header.
+        # The first cut is the end of the header, which is already the start of a row
+        inquote = [None]
+        for count in quotes:
+            inquote.append(bool(inquote[-1]) != (count % 2 == 1))
+        return [(self.csv_fname, start, inquote[i], end, inquote[i + 1], self.size)
+                for i, (start, end) in enumerate(spans)]
+
+    def chunks(self):
+        """
+        Generator of the rows of every chunk, in file order
+        :yield list of rows, without the header
+        """
+        yield from self._map(_chunk_task, [(None, args) for args in self.ranges()])
+
+    def rows(self):
+        """
+        Generator of all rows in file order, header first, like tweetfeed.get_twitter_data
+        """
+        yield list(self.header)
+        for chunk in self.chunks():
+            yield from chunk
+
+    def map_reduce(self, mapper, reducer, initial=None):
+        """
+        :param mapper: picklable function called as mapper(rows) on the rows of every chunk, in a worker
+        :param reducer: function called as reducer(total, partial) in this process, in file order
+        :param initial: starting total, None starts from the first partial result
+        :return: reduced result, None if the file has no rows and there is no initial value
+        """
+        partials = self._map(_chunk_task, [(mapper, args) for args in self.ranges()])
+        total = next(partials, None) if initial is None else initial
+        for partial in partials:
+            total = reducer(total, partial)
+        return total
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+def iter_rows(csv_fname, nworkers=None, chunksize=CHUNKSIZE):
+    """
+    Generator function that reads a csv file in parallel chunks
+    Drop-in for get_twitter_data: get_userlocation(iter_rows('twitterfeed.csv'))
+    :param  csv_fname: csv file with a header row
+            nworkers: number of worker processes, None for one per cpu
+            chunksize: bytes per chunk
+    :yield  header row, then every row in file order
+    """
+    with ChunkedCSV(csv_fname, nworkers=nworkers, chunksize=chunksize) as reader:
+        yield from reader.rows()
+
+
+def map_reduce(csv_fname, mapper, reducer, initial=None, nworkers=None, chunksize=CHUNKSIZE):
+    """
+    Run mapper on every chunk of rows in worker processes and merge the results with reducer
+    :param  csv_fname: csv file with a header row
+            mapper: picklable function of a list of rows (header excluded)
+            reducer: function merging two mapper results
+            initial: starting value for reducer, None starts from the first mapper result
+            nworkers: number of worker processes, None for one per cpu
+            chunksize: bytes per chunk
+    :return reduced result
+    """
+    with ChunkedCSV(csv_fname, nworkers=nworkers, chunksize=chunksize) as reader:
+        return reader.map_reduce(mapper, reducer, initial)
+
+
+def _count_country(rows, country):
+    return sum(1 for row in rows if row[LOCATION_COLUMN].find(country) >= 0), len(rows)
+
+
+def _add_counts(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def count_tweets(csv_fname, country='Australia', nworkers=None, chunksize=CHUNKSIZE):
+    """
+    Percentage of tweets from a country, counted per chunk in parallel
+    :param  csv_fname: twitter feed csv file
+            country: text to look for in the user location
+    :return number of tweets from country
+    """
+    count_country, count_tweets = map_reduce(csv_fname, functools.partial(_count_country, country=country),
+                                             _add_counts, (0, 0), nworkers=nworkers, chunksize=chunksize)
+
+    print('done searching')
+    percentage_tweets = (count_country / float(count_tweets)) * 100 if count_tweets else 0.0
+    print('Total tweets {}'.format(count_tweets))
+    print('Percentage of tweets from {} = {}'.format(country, percentage_tweets))
+    return count_country
+
+
+def _count_locations(rows, countrylist):
+    from asppsamples.twitter.locationmatcher import LocationMatcher
+    countdict, _ = LocationMatcher(countrylist).count((row[LOCATION_COLUMN] for row in rows), skip_header=False)
+    return countdict
+
+
+def _add_countdicts(a, b):
+    return {key: a[key] + b[key] for key in a}
+
+
+def count_tweets_by_location(csv_fname, countrylist, nworkers=None, chunksize=CHUNKSIZE):
+    """
+    Count tweets from multiple locations, per chunk in parallel
+    :param  csv_fname: twitter feed csv file
+            countrylist: list of countries, or dictionary of region: list of aliases
+    :return dictionary of country: number of tweets
+    """
+    countdict = map_reduce(csv_fname, functools.partial(_count_locations, countrylist=countrylist),
+                           _add_countdicts, nworkers=nworkers, chunksize=chunksize)
+    if countdict is None:  # No rows
+        countdict = {key: 0 for key in countrylist}
+
+    print('done searching')
+    print(countdict)
+    return countdict
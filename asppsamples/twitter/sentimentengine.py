@@ -0,0 +1,184 @@
+"""
+Batched, memoized sentiment scoring of tweets
+Many tweets in a feed are retweets ('RT @someone: ...') or copies of the same text. Every text is normalized
+first (retweet prefix removed, whitespace collapsed), and the polarity is cached by a hash of the normalized
+text in a bounded LRU cache, so each distinct text is only scored once. The texts that are not cached yet
+are scored in batches, in a pool of worker processes when nworkers > 0.
+The result is a pandas DataFrame built from whole columns, with the same columns as get_tweet_sentiment in
+Twitter.ipynb: text, Sentiment and SentimentClass.
+
+    engine = SentimentEngine(nworkers=4)
+    A = engine.frame(get_text(get_twitter_data('tweets.csv')), skip_header=True)
+"""
+import hashlib
+import multiprocessing as mp
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+SENTIMENT_CLASSES = ('Negative', 'Neutral', 'Positive')
+_RETWEET = re.compile(r'^(?:RT\s+@\w+:?\s*)+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """
+    :param text: tweet text
+    :return: text without the retweet prefix and with runs of whitespace made into one space
+    """
+    return _SPACES.sub(' ', _RETWEET.sub('', text)).strip()
+
+
+def text_key(normalized):
+    """
+    :return: 16 byte hash of a normalized text, used as the cache key
+    """
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
+
+def textblob_polarity(text):
+    """
+    :return: TextBlob polarity of the text, -1 (negative) to 1 (positive)
+    """
+    from textblob import TextBlob
+    return TextBlob(text).sentiment.polarity
+
+
+def _score_batch(task):
+    scorer, texts = task
+    return [scorer(text) for text in texts]
+
+
+class LRUCache:
+    def __init__(self, maxsize=100000):
+        """
+        Dictionary that forgets the least recently used entries beyond maxsize
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class SentimentEngine:
+    def __init__(self, scorer=textblob_polarity, cachesize=100000, nworkers=0, batchsize=256, context=None):
+        """
+        :param scorer: picklable function text -> polarity, -1 to 1
+        :param cachesize: most distinct texts kept in the cache
+        :param nworkers: number of worker processes, 0 scores in this process
+        :param batchsize: texts sent to a worker at a time
+        :param context: multiprocessing start method ('fork', 'spawn', 'forkserver'), None for the default
+        """
+        self.scorer = scorer
+        self.cache = LRUCache(cachesize)
+        self.nworkers = nworkers
+        self.batchsize = max(1, int(batchsize))
+        self.ctx = mp.get_context(context)
+        self.pool = None
+
+        # Counters
+        self.texts = 0  # texts asked for
+        self.hits = 0  # found in the cache
+        self.duplicates = 0  # repeated within one call, scored once
+        self.scored = 0  # sent to the scorer
+
+    def _score(self, texts):
+        batches = [(self.scorer, texts[i:i + self.batchsize]) for i in range(0, len(texts), self.batchsize)]
+        if not self.nworkers or len(batches) == 1:
+            results = map(_score_batch, batches)
+        else:
+            if self.pool is None:
+                self.pool = self.ctx.Pool(self.nworkers)
+            results = self.pool.imap(_score_batch, batches)
+        return [polarity for batch in results for polarity in batch]
+
+    def score(self, texts):
+        """
+        :param texts: iterable of tweet texts
+        :return: list of the texts, array of their polarity
+        """
+        texts = list(texts)
+        polarity = np.empty(len(texts), dtype=np.float64)
+        missing = {}  # key -> (normalized text, positions in texts)
+        for i, text in enumerate(texts):
+            normalized = normalize_text(text)
+            key = text_key(normalized)
+            value = self.cache.get(key)
+            if value is not None:
+                polarity[i] = value
+                self.hits += 1
+            elif key in missing:
+                missing[key][1].append(i)
+                self.duplicates += 1
+            else:
+                missing[key] = (normalized, [i])
+        self.texts += len(texts)
+
+        if missing:
+            keys = list(missing)
+            scores = self._score([missing[key][0] for key in keys])
+            self.scored += len(keys)
+            for key, value in zip(keys, scores):
+                self.cache.put(key, value)
+                polarity[missing[key][1]] = value
+        return texts, polarity
+
+    def frame(self, texts, skip_header=False):
+        """
+        :param texts: iterable of tweet texts, for example get_text(get_twitter_data(filename))
+        :param skip_header: the first item is the column name
+        :return: pandas DataFrame with columns text, Sentiment and SentimentClass
+        """
+        import pandas as pd
+
+        texts = iter(texts)
+        if skip_header:
+            next(texts, None)
+        texts, polarity = self.score(texts)
+        codes = np.full(len(polarity), -1, dtype=np.int8)  # -1 is NaN in a Categorical
+        finite = np.isfinite(polarity)
+        codes[finite] = np.sign(polarity[finite]).astype(np.int8) + 1
+        classes = pd.Categorical.from_codes(codes, SENTIMENT_CLASSES)
+        return pd.DataFrame({'text': texts, 'Sentiment': polarity, 'SentimentClass': classes})
+
+    def stats(self):
+        return {'texts': self.texts, 'hits': self.hits, 'duplicates': self.duplicates, 'scored': self.scored,
+                'cached': len(self.cache)}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_tweet_sentiment(array_iter, engine=None):
+    """
+    Sentiment of every tweet, header row skipped
+    :param  array_iter: iterable of tweet texts, header first
+            engine: SentimentEngine, None makes one that scores in this process
+    :return DataFrame with columns text, Sentiment and SentimentClass
+    """
+    engine = engine or SentimentEngine()
+    return engine.frame(array_iter, skip_header=True)
@@ -0,0 +1,338 @@
+"""
+Columnar on-disk cache of a twitter feed csv file
+The csv file is parsed once and stored column by column next to it, in <csv file>.cache/:
+    numeric columns (coordinates, retweets)  - .npy arrays, memory mapped when read, and a mask of the
+                                               empty cells when there are any
+    DateCreated                              - .npy array of seconds since 1970, memory mapped
+    text columns (tweet, handle, location)   - utf-8 bytes of all rows in one file, plus an array of
+                                               offsets where every row starts
+The cache is rebuilt when the size or modification time of the csv file changes. A column is only stored
+as numbers when every cell prints back as it was written, so rows read from the cache are the rows of the
+csv file cell for cell (python -m asppsamples.twitter.tweetcache checks this).
+
+Reading one column only touches the files of that column and never runs the csv parser.
+get_twitter_data(csv_fname, columns=[...]) yields rows in the same layout as
+tweetfeed.get_twitter_data, with only the requested columns filled in, so the existing generators
+(get_userlocation, get_xy, get_text, ...) work on it unchanged:
+
+    count_tweets(get_userlocation(get_twitter_data('twitterfeed.csv', columns=['UserLocation'])))
+"""
+import csv
+import itertools
+import json
+import mmap
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+CACHE_VERSION = 2
+TIME_LENGTH = len('2017-12-13 11:28:38')
+MISSING_TIME = np.iinfo(np.int64).min  # NaT
+
+
+def cache_dir(csv_fname):
+    return csv_fname + '.cache'
+
+
+def _source_signature(csv_fname):
+    st = os.stat(csv_fname)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _time_text(times):
+    """
+    :param times: datetime64[s] array
+    :return: array of the times as 'YYYY-MM-DD HH:MM:SS', '' for NaT
+    """
+    text = np.char.replace(np.datetime_as_string(times), 'T', ' ')
+    return np.where(text == 'NaT', '', text)
+
+
+def _convert_column(values):
+    """
+    Convert a column to the narrowest type that gives back the text of every cell exactly.
+    A column with a cell that would come back different ('007', '3.50', '1e3') stays text
+    :param values: list of the csv cells of a column
+    :return: kind: 'int', 'float', 'time' or 'str'
+             array: the converted values, None for 'str'. Empty cells are 0 in int columns, NaN in float
+                    columns and NaT in time columns
+             missing: boolean array of the empty cells of an int or float column, None if there are none
+    """
+    cells = np.array(values, dtype=str)
+    empty = cells == ''
+    if empty.all():
+        return 'str', None, None
+    filled = cells[~empty]
+    missing = empty if empty.any() else None
+    try:
+        ints = np.where(empty, '0', cells).astype(np.int64)
+        if (ints[~empty].astype(str) == filled).all():
+            return 'int', ints, missing
+    except (ValueError, OverflowError):
+        pass
+    try:
+        floats = np.where(empty, 'nan', cells).astype(np.float64)
+        if all(str(v) == c for v, c in zip(floats[~empty].tolist(), filled.tolist())):
+            return 'float', floats, missing
+    except ValueError:
+        pass
+    if (np.char.str_len(filled) == TIME_LENGTH).all():  # Only full 'YYYY-MM-DD HH:MM:SS' dates
+        try:
+            times = cells.astype('datetime64[s]')  # Empty cells become NaT
+            if (_time_text(times) == cells).all():
+                return 'time', times.astype(np.int64), None
+        except ValueError:
+            pass
+    return 'str', None, None
+
+
+def build_cache(csv_fname, cachedir=None):
+    """
+    Parse the csv file once and write the column files
+    :param csv_fname: twitter feed csv file
+    :param cachedir: where to put the cache, defaults to <csv_fname>.cache
+    :return: cachedir
+    """
+    cachedir = cachedir or cache_dir(csv_fname)
+    signature = _source_signature(csv_fname)
+
+    with open(csv_fname, 'r', newline='') as f:
+        rows = csv.reader(f)
+        header = next(rows, [])
+        columns = [[] for _ in header]
+        for row in rows:
+            for i, column in enumerate(columns):
+                column.append(row[i] if i < len(row) else '')
+
+    # Write into a new folder and swap it in at the end, so readers never see half a cache
+    tmpdir = f'{cachedir}.tmp-{os.getpid()}'
+    shutil.rmtree(tmpdir, ignore_errors=True)
+    os.makedirs(tmpdir)
+
+    kinds = {}
+    for i, (name, values) in enumerate(zip(header, columns)):
+        kind, array, missing = _convert_column(values)
+        kinds[name] = kind
+        if array is not None:
+            np.save(os.path.join(tmpdir, f'{i}.npy'), array)
+            if missing is not None:
+                np.save(os.path.join(tmpdir, f'{i}.missing.npy'), missing)
+        else:
+            encoded = [v.encode('utf-8') for v in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            with open(os.path.join(tmpdir, f'{i}.data'), 'wb') as out:
+                out.write(b''.join(encoded))
+            np.save(os.path.join(tmpdir, f'{i}.offsets.npy'), offsets)
+
+    meta = {'version': CACHE_VERSION, 'source': os.path.abspath(csv_fname), 'rows': len(columns[0]) if columns else 0,
+            'header': header, 'kinds': kinds, **signature}
+    with open(os.path.join(tmpdir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+    shutil.rmtree(cachedir, ignore_errors=True)
+    os.replace(tmpdir, cachedir)
+    return cachedir
+
+
+class StringColumn:
+    def __init__(self, datafile, offsetsfile):
+        """
+        Text column backed by a memory mapped file of utf-8 bytes and the row offsets
+        """
+        self.offsets = np.load(offsetsfile, mmap_mode='r')
+        self._file = open(datafile, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return self._data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def __iter__(self):
+        data = self._data
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].decode('utf-8')
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class TweetCache:
+    def __init__(self, cachedir):
+        """
+        Open a cache written by build_cache, use open_cache to also check that it is up to date
+        """
+        self.cachedir = cachedir
+        with open(os.path.join(cachedir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.header = self.meta['header']
+        self.kinds = self.meta['kinds']
+        self.rows = self.meta['rows']
+        self._columns = {}
+
+    def index(self, name):
+        return self.header.index(name)
+
+    def column(self, name):
+        """
+        :param name: column name from the csv header
+        :return: memory mapped numpy array for numeric and time columns (time in seconds since 1970),
+                 StringColumn for text columns. Empty cells of int columns are 0, see missing
+        """
+        if name not in self._columns:
+            i = self.index(name)
+            if self.kinds[name] == 'str':
+                self._columns[name] = StringColumn(os.path.join(self.cachedir, f'{i}.data'),
+                                                   os.path.join(self.cachedir, f'{i}.offsets.npy'))
+            else:
+                self._columns[name] = np.load(os.path.join(self.cachedir, f'{i}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    def missing(self, name):
+        """
+        :return: boolean array of the empty cells of an int or float column, None if it has none
+        """
+        fname = os.path.join(self.cachedir, f'{self.index(name)}.missing.npy')
+        if self.kinds[name] not in ('int', 'float') or not os.path.exists(fname):
+            return None
+        return np.load(fname)
+
+    def iter_strings(self, name):
+        """
+        Generator of the values of a column as the text that was in the csv file
+        """
+        kind = self.kinds[name]
+        column = self.column(name)
+        if kind == 'str':
+            yield from column
+        elif kind in ('int', 'float'):
+            missing = self.missing(name)
+            if missing is None:
+                for v in column.tolist():
+                    yield str(v)
+            else:
+                for v, empty in zip(column.tolist(), missing.tolist()):
+                    yield '' if empty else str(v)
+        else:
+            yield from _time_text(np.asarray(column).astype('datetime64[s]')).tolist()
+
+    def close(self):
+        for column in self._columns.values():
+            if isinstance(column, StringColumn):
+                column.close()
+        self._columns = {}
+
+
+def is_fresh(csv_fname, cachedir=None):
+    """
+    :return: True if the cache exists and was built from the csv file as it is now
+    """
+    metafile = os.path.join(cachedir or cache_dir(csv_fname), 'meta.json')
+    try:
+        with open(metafile) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    signature = _source_signature(csv_fname)
+    return (meta.get('version') == CACHE_VERSION and meta.get('size') == signature['size']
+            and meta.get('mtime_ns') == signature['mtime_ns'])
+
+
+def open_cache(csv_fname, cachedir=None, rebuild=False):
+    """
+    Open the cache of a csv file, building it first if it is missing or out of date
+    :param csv_fname: twitter feed csv file
+    :param cachedir: where the cache is, defaults to <csv_fname>.cache
+    :param rebuild: build the cache even if it is up to date
+    :return: TweetCache
+    """
+    cachedir = cachedir or cache_dir(csv_fname)
+    if rebuild or not is_fresh(csv_fname, cachedir):
+        build_cache(csv_fname, cachedir)
+    return TweetCache(cachedir)
+
+
+def get_twitter_data(csv_fname, columns=None):
+    """
+    Generator function that reads rows from the cache instead of parsing the csv file
+    :param  csv_fname: twitter feed csv file
+            columns: names of the columns to read, None for all.
+                     Other columns are '' so the positions match the csv file
+    :yield  header row, then one list per tweet
+    """
+    cache = open_cache(csv_fname)
+    try:
+        names = cache.header if columns is None else columns
+        positions = [cache.index(name) for name in names]
+        yield list(cache.header)
+
+        row = [''] * len(cache.header)
+        for values in zip(*(cache.iter_strings(name) for name in names)):
+            for position, value in zip(positions, values):
+                row[position] = value
+            yield list(row)
+    finally:
+        cache.close()
+
+
+def read_column(csv_fname, column):
+    """
+    Generator function of a single column, header first.
+    read_column(f, 'UserLocation') yields the same as get_userlocation(get_twitter_data(f))
+    :param  csv_fname: twitter feed csv file
+            column: column name
+    :yield  column name, then the value of every tweet
+    """
+    cache = open_cache(csv_fname)
+    try:
+        yield column
+        yield from cache.iter_strings(column)
+    finally:
+        cache.close()
+
+
+def check_roundtrip(csv_fname):
+    """
+    Check that rows read from the cache are the rows of the csv file, cell for cell
+    :param csv_fname: twitter feed csv file
+    :return: number of rows checked
+    :raises ValueError: at the first row that comes back different
+    """
+    with open(csv_fname, 'r', newline='') as f:
+        rows = csv.reader(f)
+        header = next(rows, [])
+        cached = get_twitter_data(csv_fname)
+        if next(cached) != header:
+            raise ValueError(f'Header of the cache of {csv_fname} differs from the csv file')
+        n = 0
+        for n, (row, cachedrow) in enumerate(itertools.zip_longest(rows, cached), 1):
+            if row is not None:
+                row = row[:len(header)] + [''] * (len(header) - len(row))
+            if row != cachedrow:
+                raise ValueError(f'Row {n} of {csv_fname}: csv {row}, cache {cachedrow}')
+    return n
+
+
+if __name__ == '__main__':
+    # Empty cells in numeric columns, leading zeros and floats that do not print as they were written
+    sample = [['Tweet', 'UserLocation', 'LocationX', 'LocationY', 'NumberofRetweets', 'Code', 'Score'],
+              ['first', 'Paris', '2.35', '48.85', '3', '007', '1.50'],
+              ['second', '', '', '', '', '12', '2'],
+              ['third', 'Berlin', '13.4', '52.52', '10', '', '']]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, 'sample.csv')
+        with open(fname, 'w', newline='') as f:
+            csv.writer(f).writerows(sample)
+        print(f'sample.csv: {check_roundtrip(fname)} rows read back exactly')
+    if os.path.exists('twitterfeed.csv'):
+        print(f'twitterfeed.csv: {check_roundtrip("twitterfeed.csv")} rows read back exactly')
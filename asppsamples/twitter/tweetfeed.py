@@ -0,0 +1,33 @@
+"""
+Generator functions to read the twitter feed csv files
+These are the readers used in Sample-TwitterFeedAnalysis.ipynb and Twitter.ipynb.
+Each generator passes on one part of every row, the first row of the file is the header.
+"""
+import csv
+
+
+def get_twitter_data(csv_fname):  # Open csv file
+    with open(csv_fname, 'r', newline='') as f:
+        csvreader = csv.reader(f)
+        for line in csvreader:
+            yield line
+
+
+def get_userlocation(array_iter):  # Get array holding user location info
+    for i, arr in enumerate(array_iter):
+        yield arr[2]
+
+
+def get_xy(array_iter):  # Get longitude, latitude and location of tweet
+    for i, arr in enumerate(array_iter):
+        yield arr[2], arr[3], arr[1]
+
+
+def get_text(array_iter):  # Get text of tweet
+    for i, arr in enumerate(array_iter):
+        yield arr[0]
+
+
+def get_hashtags(array_iter):  # Get array holding hashtags
+    for i, arr in enumerate(array_iter):
+        yield arr[1]
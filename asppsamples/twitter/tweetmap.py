@@ -0,0 +1,467 @@
+"""
+Live map of tweets that follows the csv file as the stream listener appends to it
+Instead of re-reading the whole file and re-plotting every point on every refresh:
+    TailFollower  - remembers the byte offset it has read up to and only parses rows appended since
+    create_map    - the Basemap projection is built once and cached, only the drawing is per axis
+    LiveTweetMap  - one scatter artist for all tweets, new points are appended to a growing buffer
+So reading and projecting cost time in proportion to the number of new tweets. Setting the points of the
+scatter copies all of them, so past maxpoints tweets the map switches to a density layer.
+
+With many tweets, points are better shown as a density layer: DensityGrid projects all coordinates in one
+call and adds them to the counts of a square or hexagonal grid, and DensityLayer draws the counts.
+Adding tweets costs time in proportion to the new tweets, drawing in proportion to the grid size.
+plot_on_map draws a whole file this way, LiveTweetMap(..., density='hex') keeps the layer up to date.
+
+    livemap = LiveTweetMap('tweetcoordinates.csv')
+    while time.time() < closetime:
+        if livemap.refresh():
+            display.clear_output(wait=True)
+            display.display(livemap.figure)
+"""
+import csv
+import functools
+import io
+import os
+import time
+
+import numpy as np
+
+DENSITY_KINDS = ('grid', 'hex')
+WORLD_EXTENT = (-180.0, 180.0, -90.0, 90.0)
+QUOTE = ord('"')
+NEWLINE = ord('\n')
+
+
+def _complete_end(data):
+    """
+    :param data: bytes that start at the beginning of a row
+    :return: length of the part of data made of complete rows, ending in a newline outside quotes
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == NEWLINE)
+    if not len(newlines):
+        return 0
+    quotes = np.cumsum(buf == QUOTE)
+    outside = newlines[quotes[newlines] % 2 == 0]  # Newlines inside a quoted field are part of the field
+    return int(outside[-1]) + 1 if len(outside) else 0
+
+
+class TailFollower:
+    def __init__(self, csv_fname, skip_header=True):
+        """
+        Read the rows of a csv file that another process keeps appending to
+        :param csv_fname: csv file
+        :param skip_header: keep the first row out of the rows returned by poll, it is in header
+        """
+        self.csv_fname = csv_fname
+        self.skip_header = skip_header
+        self.header = None
+        self.offset = 0  # bytes read and parsed so far, always the start of a row
+        self.rows = 0  # rows returned since the start
+        self.resets = 0  # times the file was replaced or truncated and reading started over
+        self._inode = None
+
+    def poll(self):
+        """
+        :return: list of the complete rows appended since the last poll.
+                 A row that is still being written is left for the next poll
+        """
+        try:
+            st = os.stat(self.csv_fname)
+        except FileNotFoundError:
+            return []
+        if st.st_ino != self._inode or st.st_size < self.offset:
+            if self._inode is not None:
+                self.resets += 1
+            self._inode = st.st_ino
+            self.offset = 0
+            self.header = None
+        if st.st_size == self.offset:
+            return []
+
+        with open(self.csv_fname, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(st.st_size - self.offset)
+        end = _complete_end(data)
+        if not end:
+            return []
+        self.offset += end
+
+        rows = list(csv.reader(io.StringIO(data[:end].decode('utf-8'), newline='')))
+        if self.header is None and rows:
+            self.header = rows[0]
+            if self.skip_header:
+                rows = rows[1:]
+        self.rows += len(rows)
+        return rows
+
+
+@functools.lru_cache(maxsize=None)
+def _basemap():
+    from mpl_toolkits.basemap import Basemap
+
+    # Reading the coastline database and setting up the projection is the slow part, so it happens once
+    return Basemap(projection='merc', lat_0=50, lon_0=-100,
+                   resolution='l', area_thresh=5000.0,
+                   llcrnrlon=-140, llcrnrlat=-55,
+                   urcrnrlon=160, urcrnrlat=70)
+
+
+def create_map(axis=None):
+    """
+    Draw the blank world map on an axis, the Basemap itself is only built on the first call
+    :param axis: axis to draw on, None for the current axis
+    :return: Basemap, call it as x, y = my_map(longitude, latitude) to project points
+    """
+    my_map = _basemap()
+
+    # draw elements onto the world map
+    my_map.drawcountries(ax=axis)
+    my_map.drawcoastlines(antialiased=False, linewidth=0.005, ax=axis)
+    return my_map
+
+
+def map_extent(projection):
+    """
+    :return: xmin, xmax, ymin, ymax of a Basemap in projected coordinates, the whole world in degrees otherwise
+    """
+    try:
+        return projection.llcrnrx, projection.urcrnrx, projection.llcrnry, projection.urcrnry
+    except AttributeError:
+        return WORLD_EXTENT
+
+
+def parse_coordinates(rows, xy_columns=(2, 3), label_column=1):
+    """
+    :param rows: list of csv rows, header excluded
+    :param xy_columns: columns of longitude and latitude
+    :param label_column: column of the label of a tweet
+    :return: longitude and latitude arrays of the rows with valid coordinates, label of the last of them,
+             number of rows without valid coordinates
+    """
+    xcol, ycol = xy_columns
+    lon = np.empty(len(rows))
+    lat = np.empty(len(rows))
+    n = 0
+    label = None
+    for row in rows:
+        try:
+            lon[n] = float(row[xcol])
+            lat[n] = float(row[ycol])
+        except (ValueError, IndexError, TypeError):
+            continue
+        if len(row) > label_column:
+            label = row[label_column]
+        n += 1
+    ok = np.isfinite(lon[:n]) & np.isfinite(lat[:n])
+    return lon[:n][ok], lat[:n][ok], label, len(rows) - int(ok.sum())
+
+
+class DensityGrid:
+    def __init__(self, extent, gridsize=100, kind='hex'):
+        """
+        Tweet counts on a grid that points can be added to at any time
+        :param extent: xmin, xmax, ymin, ymax of the grid, in projected coordinates
+        :param gridsize: number of cells across, or (across, up). With one number the cells are about
+                         as high as they are wide
+        :param kind: 'grid' for square cells, 'hex' for hexagons as in matplotlib's hexbin
+        """
+        if kind not in DENSITY_KINDS:
+            raise ValueError(f'kind must be one of {DENSITY_KINDS}, not {kind!r}')
+        self.extent = tuple(float(v) for v in extent)
+        self.kind = kind
+        xmin, xmax, ymin, ymax = self.extent
+        if np.iterable(gridsize):
+            nx, ny = gridsize
+        else:
+            nx = int(gridsize)
+            ny = nx * (ymax - ymin) / (xmax - xmin)
+            ny = max(1, int(round(ny / np.sqrt(3) if kind == 'hex' else ny)))
+        self.nx, self.ny = nx, ny
+        self.sx = (xmax - xmin) / nx
+        self.sy = (ymax - ymin) / ny
+        if kind == 'grid':
+            self.counts = np.zeros((ny, nx), dtype=np.int64)
+        else:
+            # Two offset lattices of hexagon centers, (nx + 1) x (ny + 1) on the corners and nx x ny in between
+            self.counts = np.zeros((nx + 1) * (ny + 1) + nx * ny, dtype=np.int64)
+        self.total = 0
+        self.outside = 0  # points that fell outside the extent
+
+    def _indices(self, x, y):
+        """
+        :return: flat cell index of every point, -1 for points outside the grid
+        """
+        xmin, xmax, ymin, ymax = self.extent
+        ix = (x - xmin) / self.sx
+        iy = (y - ymin) / self.sy
+        if self.kind == 'grid':
+            ix = np.floor(ix).astype(np.int64)
+            iy = np.floor(iy).astype(np.int64)
+            inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+            return np.where(inside, iy * self.nx + ix, -1)
+
+        # Nearest center on each lattice, the closer one wins (same rule as hexbin)
+        nx1, ny1 = self.nx + 1, self.ny + 1
+        ix1 = np.round(ix).astype(np.int64)
+        iy1 = np.round(iy).astype(np.int64)
+        ix2 = np.floor(ix).astype(np.int64)
+        iy2 = np.floor(iy).astype(np.int64)
+        first = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2 < (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+        inside1 = (ix1 >= 0) & (ix1 < nx1) & (iy1 >= 0) & (iy1 < ny1)
+        inside2 = (ix2 >= 0) & (ix2 < self.nx) & (iy2 >= 0) & (iy2 < self.ny)
+        return np.where(first, np.where(inside1, ix1 * ny1 + iy1, -1),
+                        np.where(inside2, nx1 * ny1 + ix2 * self.ny + iy2, -1))
+
+    def add(self, x, y):
+        """
+        Add points, in projected coordinates
+        :return: number of points that fell inside the grid
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        index = self._indices(x, y)
+        index = index[index >= 0]
+        self.counts.ravel()[:] += np.bincount(index, minlength=self.counts.size)
+        self.total += len(x)
+        self.outside += len(x) - len(index)
+        return len(index)
+
+    def clear(self):
+        self.counts[:] = 0
+        self.total = 0
+        self.outside = 0
+
+    def hexagons(self):
+        """
+        :return: corners of every hexagon, shape (number of cells, 6, 2), in the order of counts
+        """
+        xmin, xmax, ymin, ymax = self.extent
+        nx1, ny1 = self.nx + 1, self.ny + 1
+        centers = np.zeros((self.counts.size, 2))
+        centers[:nx1 * ny1, 0] = np.repeat(np.arange(nx1), ny1)
+        centers[:nx1 * ny1, 1] = np.tile(np.arange(ny1), nx1)
+        centers[nx1 * ny1:, 0] = np.repeat(np.arange(self.nx) + 0.5, self.ny)
+        centers[nx1 * ny1:, 1] = np.tile(np.arange(self.ny), self.nx) + 0.5
+        centers = centers * (self.sx, self.sy) + (xmin, ymin)
+        corners = np.array([[0.5, -0.5], [0.5, 0.5], [0.0, 1.0], [-0.5, 0.5], [-0.5, -0.5], [0.0, -1.0]])
+        corners = corners * (self.sx, self.sy / 3)
+        return centers[:, None, :] + corners[None, :, :]
+
+
+class DensityLayer:
+    def __init__(self, axis, grid, cmap='inferno_r', alpha=0.8, zorder=3):
+        """
+        Draw the counts of a DensityGrid, empty cells are left transparent
+        The artist is made once, update only sets its new counts
+        :param axis: axis to draw on
+        :param grid: DensityGrid
+        :param cmap: colormap of the counts, on a log scale
+        :param alpha: transparency of the layer
+        :param zorder: drawing order, above the coastlines by default
+        """
+        import matplotlib
+        from matplotlib.collections import PolyCollection
+        from matplotlib.colors import LogNorm
+
+        self.axis = axis
+        self.grid = grid
+        cmap = matplotlib.colormaps[cmap].with_extremes(bad=(0, 0, 0, 0)) if isinstance(cmap, str) else cmap
+        self.norm = LogNorm(vmin=1, vmax=10)
+        if grid.kind == 'grid':
+            self.artist = axis.imshow(self._masked(), extent=grid.extent, origin='lower', cmap=cmap, norm=self.norm,
+                                      interpolation='nearest', alpha=alpha, zorder=zorder, aspect='auto')
+        else:
+            self.artist = PolyCollection(grid.hexagons(), cmap=cmap, norm=self.norm, alpha=alpha, zorder=zorder,
+                                         edgecolors='face', linewidths=0)
+            self.artist.set_array(self._masked())
+            axis.add_collection(self.artist, autolim=False)
+        xmin, xmax, ymin, ymax = grid.extent
+        axis.set_xlim(xmin, xmax)
+        axis.set_ylim(ymin, ymax)
+
+    def _masked(self):
+        return np.ma.masked_equal(self.grid.counts, 0)
+
+    def update(self):
+        """
+        Show the current counts of the grid
+        """
+        counts = self._masked()
+        self.norm.vmax = max(10, int(self.grid.counts.max()))
+        if self.grid.kind == 'grid':
+            self.artist.set_data(counts)
+        else:
+            self.artist.set_array(counts)
+
+
+def plot_on_map(array_iter, gridsize=100, kind='hex', axis=None, projection=None):
+    """
+    Density map of all tweets: coordinates are projected in one call and counted on a grid,
+    so drawing takes as long for a million tweets as for a hundred
+    :param  array_iter: iterable of (longitude, latitude, label) with a header first, for example get_xy(...)
+            gridsize: number of cells across
+            kind: 'grid' or 'hex'
+            axis: axis to draw on, None for the current axis
+            projection: function x, y = projection(longitudes, latitudes), None draws the world map with create_map
+    :return DensityLayer
+    """
+    if axis is None:
+        import matplotlib.pyplot as plt
+        axis = plt.gca()
+    if projection is None:
+        projection = create_map(axis)
+    rows = list(array_iter)[1:]  # Skip header row
+    lon, lat, label, _ = parse_coordinates(rows, xy_columns=(0, 1), label_column=2)
+
+    grid = DensityGrid(map_extent(projection), gridsize=gridsize, kind=kind)
+    if len(lon):
+        grid.add(*projection(lon, lat))
+    layer = DensityLayer(axis, grid)
+    layer.update()
+    if label is not None:
+        axis.set_title('{} tweets, last from: {}'.format(grid.total, label))
+    return layer
+
+
+class PointBuffer:
+    def __init__(self, capacity=1024):
+        """
+        x, y points in an array that doubles in size when it is full, so appending is amortized O(1) per point
+        """
+        self._points = np.empty((capacity, 2), dtype=np.float64)
+        self.count = 0
+
+    def extend(self, x, y):
+        n = len(x)
+        if self.count + n > len(self._points):
+            grown = np.empty((max(2 * len(self._points), self.count + n), 2), dtype=np.float64)
+            grown[:self.count] = self._points[:self.count]
+            self._points = grown
+        self._points[self.count:self.count + n, 0] = x
+        self._points[self.count:self.count + n, 1] = y
+        self.count += n
+
+    def clear(self):
+        self.count = 0
+
+    @property
+    def points(self):
+        """
+        View of the points so far, shape (count, 2)
+        """
+        return self._points[:self.count]
+
+
+class LiveTweetMap:
+    def __init__(self, csv_fname, axis=None, projection=None, xy_columns=(2, 3), label_column=1,
+                 figsize=(10, 10), markersize=5, color='r', alpha=0.5, density=None, gridsize=100,
+                 maxpoints=50000):
+        """
+        :param csv_fname: csv file of tweet coordinates that is being appended to
+        :param axis: axis to plot on, None makes a new figure
+        :param projection: function x, y = projection(longitudes, latitudes), None draws the world map
+                           with create_map and uses its projection
+        :param xy_columns: columns of longitude and latitude, as read by get_xy in Twitter.ipynb
+        :param label_column: column shown in the title for the newest tweet
+        :param figsize: size of the new figure
+        :param markersize: size of the points
+        :param color: color of the points
+        :param alpha: transparency of the points
+        :param density: None to plot every tweet as a point, 'grid' or 'hex' to show a density layer instead
+        :param gridsize: number of cells across the density layer
+        :param maxpoints: most tweets drawn as points, past it the points go into a hex density layer.
+                          None for no limit
+        """
+        if axis is None:
+            import matplotlib.pyplot as plt
+            figure = plt.figure(figsize=figsize)
+            axis = figure.add_subplot(1, 1, 1)
+        self.axis = axis
+        self.figure = axis.figure
+        self.projection = projection if projection is not None else create_map(axis)
+        self.xy_columns = xy_columns
+        self.label_column = label_column
+        self.gridsize = gridsize
+        self.maxpoints = maxpoints
+
+        self.follower = TailFollower(csv_fname)
+        self.buffer = PointBuffer()
+        self.scatter = None
+        self.layer = None
+        if density is None:
+            self.scatter = axis.scatter([], [], s=markersize ** 2, c=color, alpha=alpha)
+        else:
+            self.layer = DensityLayer(axis, DensityGrid(map_extent(self.projection), gridsize, kind=density))
+        self.title = axis.set_title('')
+
+        self.refreshes = 0
+        self.skipped = 0  # rows without valid coordinates
+        self.lastms = 0.0  # time of the last refresh, reading to setting the points
+
+    def refresh(self):
+        """
+        Add the tweets appended to the file since the last refresh
+        The scatter is only changed when points were added, and then gets all points so far
+        :return: number of new points
+        """
+        starttime = time.perf_counter()
+        resets = self.follower.resets
+        rows = self.follower.poll()
+        if self.follower.resets != resets:  # File was replaced, start the map over
+            self.buffer.clear()
+            if self.layer is not None:
+                self.layer.grid.clear()
+        self.refreshes += 1
+        if not rows and self.follower.resets == resets:
+            self.lastms = (time.perf_counter() - starttime) * 1000
+            return 0
+
+        lon, lat, label, skipped = parse_coordinates(rows, self.xy_columns, self.label_column)
+        self.skipped += skipped
+        changed = len(lon) or self.follower.resets != resets
+        if len(lon):
+            x, y = self.projection(lon, lat)  # Projects all new points in one call
+            if self.layer is None:
+                self.buffer.extend(x, y)
+                if self.maxpoints is not None and self.buffer.count > self.maxpoints:
+                    self._to_density()
+            else:
+                self.layer.grid.add(x, y)
+        if changed:
+            if self.layer is None:
+                self.scatter.set_offsets(self.buffer.points)
+            else:
+                self.layer.update()
+        if label is not None:
+            self.title.set_text('Tweet arrived from: {}'.format(label))
+        self.figure.canvas.draw_idle()
+        self.lastms = (time.perf_counter() - starttime) * 1000
+        return len(lon)
+
+    def _to_density(self):
+        """
+        Replace the scatter by a hex density layer holding the points so far
+        """
+        self.layer = DensityLayer(self.axis, DensityGrid(map_extent(self.projection), self.gridsize, kind='hex'))
+        points = self.buffer.points
+        self.layer.grid.add(points[:, 0], points[:, 1])
+        self.buffer.clear()
+        self.scatter.remove()
+        self.scatter = None
+
+    def follow(self, seconds=60, interval=0.5, callback=None):
+        """
+        Refresh the map until seconds have passed
+        :param seconds: how long to follow the file
+        :param interval: seconds to wait between refreshes
+        :param callback: called with the map after every refresh that added points, for example to
+                         redisplay the figure in a notebook
+        :return: total number of tweets on the map
+        """
+        closetime = time.time() + seconds
+        while time.time() < closetime:
+            if self.refresh() and callback is not None:
+                callback(self)
+            time.sleep(interval)
+        return self.buffer.count if self.layer is None else self.layer.grid.total
@@ -0,0 +1,222 @@
+"""
+Replay a recorded twitter feed into a stream listener, for load tests without a twitter connection
+Every row of the csv file becomes a status-like object with the attributes StdOutListener.on_status uses
+(text, user.location, coordinates, entities['hashtags'], created_at, retweet_count, favorite_count, lang,
+retweeted) and is passed to on_status:
+    speed=1      - at the pace the tweets were created, from the DateCreated column
+    speed=10     - ten times faster
+    speed=None   - as fast as the listener takes them
+Hashtags are taken from the tweet text. Files without coordinate columns (twitterfeed.csv) get random
+coordinates for a fraction geofraction of the tweets, so both sides of the listener's filter are exercised.
+
+The report gives the sustained events per second, the fraction of tweets that got through the filter,
+the time spent in on_status, how far behind schedule the replay fell and, when the listener has a
+BufferedCSVSink, the time from the queue to the disk.
+
+python -m asppsamples.twitter.tweetreplay twitterfeed.csv --speed 0 replays the feed through StdOutListener
+into replayfeed.csv.
+"""
+import argparse
+import csv
+import os
+import re
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from asppsamples.ringbuffer import RingSeries
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_HASHTAG = re.compile(r'#(\w+)')
+
+
+def _column(header, *names):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+class StatusFactory:
+    def __init__(self, header, geofraction=0.3, lang='en', seed=0):
+        """
+        Turns csv rows into status-like objects
+        :param header: header row of the csv file
+        :param geofraction: fraction of tweets given random coordinates when the file has none
+        :param lang: language of every tweet
+        :param seed: seed of the random coordinates, so replays are repeatable
+        """
+        self.text = _column(header, 'Tweet', 'text')
+        self.handle = _column(header, 'TwitterHandle')
+        self.location = _column(header, 'UserLocation')
+        self.x = _column(header, 'LocationX')
+        self.y = _column(header, 'LocationY')
+        self.created = _column(header, 'DateCreated')
+        self.retweets = _column(header, 'NumberofRetweets')
+        self.geofraction = geofraction
+        self.lang = lang
+        self.rng = np.random.default_rng(seed)
+
+    def created_at(self, row):
+        try:
+            return datetime.strptime(row[self.created], TIME_FORMAT)
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def _coordinates(self, row):
+        if self.x is not None and self.y is not None:
+            try:
+                return {'type': 'Point', 'coordinates': [float(row[self.x]), float(row[self.y])]}
+            except (ValueError, IndexError):
+                return None
+        if self.rng.random() < self.geofraction:
+            return {'type': 'Point', 'coordinates': [self.rng.uniform(-180, 180), self.rng.uniform(-60, 70)]}
+        return None
+
+    def __call__(self, row):
+        def get(i, default=''):
+            return row[i] if i is not None and i < len(row) else default
+
+        text = get(self.text)
+        hashtags = [{'text': m.group(1), 'indices': [m.start(), m.end()]} for m in _HASHTAG.finditer(text)]
+        try:
+            retweets = int(get(self.retweets, 0))
+        except ValueError:
+            retweets = 0
+        return SimpleNamespace(
+            text=text,
+            user=SimpleNamespace(screen_name=get(self.handle), location=get(self.location) or None),
+            coordinates=self._coordinates(row),
+            entities={'hashtags': hashtags},
+            created_at=self.created_at(row),
+            retweet_count=retweets,
+            favorite_count=0,
+            lang=self.lang,
+            retweeted=False)
+
+
+class ReplayStream:
+    def __init__(self, csv_fname, listener, speed=1.0, limit=None, geofraction=0.3, seed=0):
+        """
+        :param csv_fname: recorded feed, with a header row
+        :param listener: object with on_status(status), for example StdOutListener
+        :param speed: 1 for the pace the tweets were created at, N for N times faster, None or 0 as fast as possible
+        :param limit: most tweets to replay, None for all
+        :param geofraction: fraction of tweets given random coordinates when the file has none
+        :param seed: seed of the random coordinates
+        """
+        sink = getattr(listener, 'sink', None)
+        if sink is not None and os.path.abspath(sink.csv_fname) == os.path.abspath(csv_fname):
+            raise ValueError('The listener writes to the file being replayed, give it another csvname')
+        self.csv_fname = csv_fname
+        self.listener = listener
+        self.speed = speed or None
+        self.limit = limit
+        self.geofraction = geofraction
+        self.seed = seed
+
+        # Counters
+        self.events = 0
+        self.hits = None  # tweets the listener wrote, if it has a sink to count them with
+        self.elapsed = 0.0
+        self.callback = RingSeries(100000)  # seconds spent in on_status
+        self.lag = RingSeries(100000)  # seconds each tweet was sent after its scheduled time
+
+    def run(self):
+        """
+        Replay the file, blocking until every tweet was sent
+        :return: report dictionary, see summary
+        """
+        sink = getattr(self.listener, 'sink', None)
+        queuedbefore = sink.queued if sink is not None else None
+        with open(self.csv_fname, 'r', newline='', encoding='utf-8') as f:
+            rows = csv.reader(f)
+            factory = StatusFactory(next(rows, []), geofraction=self.geofraction, seed=self.seed)
+
+            starttime = time.perf_counter()
+            firstcreated = None
+            scheduled = starttime
+            for row in rows:
+                if self.limit is not None and self.events >= self.limit:
+                    break
+                status = factory(row)
+                if self.speed is not None and status.created_at is not None:
+                    if firstcreated is None:
+                        firstcreated = status.created_at
+                    # Tweets out of order in the file are sent straight away
+                    offset = (status.created_at - firstcreated).total_seconds() / self.speed
+                    scheduled = max(scheduled, starttime + offset)
+                    wait = scheduled - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                else:
+                    scheduled = time.perf_counter()
+
+                sent = time.perf_counter()
+                self.listener.on_status(status)
+                done = time.perf_counter()
+                self.callback.append(done - sent)
+                self.lag.append(max(0.0, sent - scheduled))
+                self.events += 1
+            self.elapsed = time.perf_counter() - starttime
+
+        if sink is not None:
+            self.hits = sink.queued - queuedbefore
+        return self.summary()
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """
+        :return: dictionary with events, elapsed seconds, events per second, hit rate and the
+                 callback and lag percentiles in milliseconds
+        """
+        latency = {}
+        for name, series in (('callback', self.callback), ('lag', self.lag)):
+            if len(series):
+                latency[name] = series.summary_ms(percentiles, mean=False, maximum=True)
+        s = {'events': self.events, 'elapsed': self.elapsed,
+             'events_per_second': self.events / self.elapsed if self.elapsed > 0 else 0.0,
+             'hits': self.hits, 'hit_rate': self.hits / self.events if self.hits is not None and self.events else None,
+             'latency_ms': latency}
+        sink = getattr(self.listener, 'sink', None)
+        if sink is not None:
+            s['sink'] = sink.metrics()
+        return s
+
+    def report(self):
+        s = self.summary()
+        print('Replayed {events} tweets in {elapsed:0.2f} seconds, {events_per_second:0.1f} tweets per second'.format(**s))
+        if s['hit_rate'] is not None:
+            print('{} tweets passed the filter ({:0.1f}%)'.format(s['hits'], 100 * s['hit_rate']))
+        for name, values in s['latency_ms'].items():
+            print('{:>9} (ms): p50 {p50:0.3f}  p90 {p90:0.3f}  p99 {p99:0.3f}  max {max:0.3f}'.format(name, **values))
+        if 'sink' in s:
+            row = s['sink']['latency_ms'].get('row')
+            if row:
+                print('queue to disk (ms): p50 {p50:0.2f}  p90 {p90:0.2f}  p99 {p99:0.2f}  max {max:0.2f}'.format(**row))
+        return s
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded feed through StdOutListener')
+    parser.add_argument('csv_fname', nargs='?', default='twitterfeed.csv', help='recorded feed')
+    parser.add_argument('--speed', type=float, default=1.0, help='1 real time, N times faster, 0 as fast as possible')
+    parser.add_argument('--limit', type=int, default=None, help='most tweets to replay')
+    parser.add_argument('--out', default='replayfeed.csv', help='file the listener writes')
+    parser.add_argument('--geofraction', type=float, default=0.3, help='fraction of tweets given coordinates')
+    args = parser.parse_args(argv)
+
+    from asppsamples.twitter.twitterstreamsample import StdOutListener
+    listener = StdOutListener(csvname=args.out)
+    replay = ReplayStream(args.csv_fname, listener, speed=args.speed, limit=args.limit,
+                          geofraction=args.geofraction)
+    try:
+        replay.run()
+    finally:
+        listener.close()
+    replay.report()
+
+
+if __name__ == '__main__':
+    main()
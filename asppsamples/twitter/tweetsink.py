@@ -0,0 +1,205 @@
+"""
+Buffered background csv writer for the twitter stream listener
+The stream callback only puts the row on a queue. A writer thread takes rows off the queue and writes
+them in batches to a file that stays open, flushing when batchsize rows are waiting or flushinterval
+seconds have passed since the first of them, whichever comes first.
+The file can be rotated by size or age: the full file is renamed to <name>-<date>-<time>.csv and a new
+file with the header row is started under the original name, so readers that follow the file keep working.
+
+    sink = BufferedCSVSink('twitterfeed.csv', header)
+    sink.put(row)       # from on_status, returns at once
+    sink.metrics()      # queue depth, rows written, write latency
+    sink.close()        # writes everything still queued
+"""
+import csv
+import os
+import queue
+import threading
+import time
+
+from asppsamples.ringbuffer import RingSeries
+
+OVERFLOW_POLICIES = ('block', 'drop')
+_STOP = object()
+
+
+class BufferedCSVSink:
+    def __init__(self, csv_fname, header, batchsize=500, flushinterval=1.0, maxbytes=None, maxage=None,
+                 maxqueue=100000, overflow='block', append=False):
+        """
+        :param csv_fname: csv file to write
+        :param header: header row, written at the top of every new file
+        :param batchsize: rows written in one go
+        :param flushinterval: most seconds a row waits in the queue before it is written
+        :param maxbytes: rotate the file when it grows past this many bytes, None for no size rotation
+        :param maxage: rotate the file after this many seconds, None for no time rotation
+        :param maxqueue: most rows waiting in the queue
+        :param overflow: 'block' makes put wait when the queue is full, 'drop' drops the row and counts it
+        :param append: add to an existing file instead of starting a new one
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}, not {overflow!r}')
+        self.csv_fname = csv_fname
+        self.header = list(header)
+        self.batchsize = max(1, int(batchsize))
+        self.flushinterval = flushinterval
+        self.maxbytes = maxbytes
+        self.maxage = maxage
+        self.overflow = overflow
+
+        # Counters
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.maxdepth = 0
+        self.rotated = []  # names of the rotated files
+        self.writelatency = RingSeries(10000)  # seconds to write and flush a batch
+        self.rowlatency = RingSeries(10000)  # seconds from put to written, oldest row of each batch
+
+        self._queue = queue.Queue(maxsize=maxqueue)
+        self._error = None
+        self._file = None
+        self._open(append)
+        self._thread = threading.Thread(target=self._run, name='BufferedCSVSink', daemon=True)
+        self._thread.start()
+
+    def _open(self, append=False):
+        exists = append and os.path.exists(self.csv_fname) and os.path.getsize(self.csv_fname) > 0
+        self._file = open(self.csv_fname, 'a' if exists else 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if not exists:
+            self._writer.writerow(self.header)
+            self._file.flush()
+        self._opened = time.time()
+        self._filerows = 0  # rows written to this file
+
+    def _rotate(self):
+        self._file.close()
+        stem, ext = os.path.splitext(self.csv_fname)
+        name = '{}-{}{}'.format(stem, time.strftime('%Y%m%d-%H%M%S'), ext)
+        n = 1
+        while os.path.exists(name):
+            name = '{}-{}-{}{}'.format(stem, time.strftime('%Y%m%d-%H%M%S'), n, ext)
+            n += 1
+        os.replace(self.csv_fname, name)
+        self.rotated.append(name)
+        self.rotations += 1
+        self._open()
+
+    def _should_rotate(self):
+        if not self._filerows:  # Never rotate out a file with only the header
+            return False
+        if self.maxbytes is not None and self._file.tell() >= self.maxbytes:
+            return True
+        return self.maxage is not None and time.time() - self._opened >= self.maxage
+
+    def _write(self, batch):
+        starttime = time.perf_counter()
+        self._writer.writerows(row for _, row in batch)
+        self._file.flush()
+        written = time.perf_counter()
+        self.writelatency.append(written - starttime)
+        self.rowlatency.append(written - batch[0][0])
+        self.written += len(batch)
+        self._filerows += len(batch)
+        self.batches += 1
+        if self._should_rotate():
+            self._rotate()
+
+    def _run(self):
+        batch = []
+        stopping = False
+        try:
+            while not stopping:
+                # Wait for the first row of a batch, then until the batch is full or flushinterval has passed
+                timeout = None if not batch else max(0.0, batch[0][0] + self.flushinterval - time.perf_counter())
+                if not batch and self.maxage is not None and self._filerows:  # Wake up to rotate by age
+                    timeout = max(0.0, self._opened + self.maxage - time.time())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    stopping = True
+                elif item is not None:
+                    batch.append(item)
+                    while len(batch) < self.batchsize:  # Take whatever else is already waiting
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is _STOP:
+                            stopping = True
+                            break
+                        batch.append(item)
+
+                if batch and (stopping or len(batch) >= self.batchsize
+                              or time.perf_counter() - batch[0][0] >= self.flushinterval):
+                    self._write(batch)
+                    batch = []
+                elif not batch and self._should_rotate():  # Time rotation while no tweets arrive
+                    self._rotate()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._file.close()
+
+    def put(self, row):
+        """
+        Queue a row for writing, called from the stream callback
+        :param row: list of values
+        :return: True if the row was queued, False if it was dropped
+        """
+        if self._error is not None:
+            raise RuntimeError(f'csv writer thread failed: {self._error!r}')
+        try:
+            self._queue.put((time.perf_counter(), row), block=self.overflow == 'block')
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        depth = self._queue.qsize()
+        if depth > self.maxdepth:
+            self.maxdepth = depth
+        return True
+
+    def close(self, timeout=10.0):
+        """
+        Write every queued row, close the file and stop the writer thread
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        if self._error is not None:
+            raise RuntimeError(f'csv writer thread failed: {self._error!r}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def metrics(self, percentiles=(50, 90, 99)):
+        """
+        :return: dictionary with the queue depth, row counts and the write and row latency
+                 percentiles in milliseconds
+        """
+        latency = {}
+        for name, series in (('write', self.writelatency), ('row', self.rowlatency)):
+            if len(series):
+                latency[name] = series.summary_ms(percentiles, mean=False, maximum=True)
+        return {'depth': self._queue.qsize(), 'maxdepth': self.maxdepth, 'queued': self.queued,
+                'written': self.written, 'dropped': self.dropped, 'batches': self.batches,
+                'rotations': self.rotations, 'latency_ms': latency}
+
+    def report(self):
+        m = self.metrics()
+        print('Tweets queued {queued}, written {written}, dropped {dropped} in {batches} batches, '
+              '{rotations} file rotations'.format(**m))
+        print('Queue depth {depth}, max {maxdepth}'.format(**m))
+        for name, values in m['latency_ms'].items():
+            print('{:>6} latency (ms): p50 {p50:0.2f}  p90 {p90:0.2f}  p99 {p99:0.2f}  max {max:0.2f}'.format(
+                name, **values))
+        return m
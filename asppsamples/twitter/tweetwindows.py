@@ -0,0 +1,160 @@
+"""
+Time windowed counts of a tweet feed, computed in one pass as the rows stream by
+Rows are put into windows by their DateCreated time: tumbling windows (size=60 gives one window per minute)
+or sliding windows (size=300, slide=60 gives the last five minutes, every minute). Every window counts
+its tweets, optionally the tweets per region (LocationMatcher) and the mean sentiment.
+
+Rows may arrive a little out of order. A window is emitted once the newest time seen is lateness seconds
+past its end (the watermark), and rows that arrive after their windows closed are counted as late and
+left out.
+Only the windows that can still receive rows are kept in memory, so the state does not grow with the feed.
+
+    for window in window_counts(get_twitter_data('twitterfeed.csv'), size=60, countrylist=['USA', 'UK']):
+        print(window.start, window.count, window.locations)
+"""
+import math
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from asppsamples.twitter.locationmatcher import LocationMatcher
+
+WindowResult = namedtuple('WindowResult', ['start', 'end', 'count', 'locations', 'sentiment'])
+WindowResult.__doc__ = """
+start, end: window times as datetimes (UTC), end excluded
+count: number of tweets in the window
+locations: dictionary of region: number of tweets, empty without regions
+sentiment: mean polarity of the tweets, None without a sentiment function or tweets
+"""
+
+
+def parse_time(value):
+    """
+    :param value: DateCreated value, 'YYYY-MM-DD HH:MM:SS' (UTC)
+    :return: seconds since 1970, None if value is not a time
+    """
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_datetime(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+class WindowAggregator:
+    def __init__(self, size=60, slide=None, lateness=10, countrylist=None, sentiment=None):
+        """
+        :param size: window length in seconds
+        :param slide: seconds between window starts, None for tumbling windows (slide = size)
+        :param lateness: seconds a row may arrive after newer rows and still be counted
+        :param countrylist: list of countries, or dictionary of region: list of aliases, to count per window
+        :param sentiment: function text -> polarity, to average per window
+        """
+        self.size = size
+        self.slide = slide or size
+        if self.slide > self.size:
+            raise ValueError('slide must not be larger than size, tweets between windows would be lost')
+        self.lateness = lateness
+        self.matcher = LocationMatcher(countrylist) if countrylist is not None else None
+        self.sentiment = sentiment
+
+        self.maxtime = None  # newest row time seen
+        self.watermark = -math.inf  # maxtime - lateness, windows that end at or before it are closed
+        self.emitted = -math.inf  # start of the last window emitted
+        self.rows = 0
+        self.late = 0  # rows left out because their windows were already emitted
+        self._windows = {}  # start -> [count, region counts, sentiment sum, sentiment count]
+
+    def _starts(self, t):
+        """
+        :return: starts of the windows that hold time t, oldest first
+        """
+        starts = []
+        s = math.floor(t / self.slide) * self.slide
+        while s > t - self.size:
+            starts.append(s)
+            s -= self.slide
+        return starts[::-1]
+
+    def add(self, t, location='', text=''):
+        """
+        Count one tweet
+        :param t: time of the tweet in seconds since 1970
+        :param location: user location, for the region counts
+        :param text: tweet text, for the sentiment
+        :return: list of WindowResult of the windows that closed
+        """
+        self.rows += 1
+        # Only windows still open, a window that ends before the watermark is closed even if it has no rows
+        starts = [s for s in self._starts(t) if s > self.emitted and s + self.size > self.watermark]
+        if not starts:
+            self.late += 1
+            return []
+
+        regions = self.matcher.match(location) if self.matcher is not None and location else ()
+        polarity = self.sentiment(text) if self.sentiment is not None else None
+        for s in starts:
+            window = self._windows.get(s)
+            if window is None:
+                nregions = len(self.matcher.regions) if self.matcher is not None else 0
+                window = self._windows[s] = [0, [0] * nregions, 0.0, 0]
+            window[0] += 1
+            for r in regions:
+                window[1][r] += 1
+            if polarity is not None:
+                window[2] += polarity
+                window[3] += 1
+
+        if self.maxtime is None or t > self.maxtime:
+            self.maxtime = t
+            self.watermark = t - self.lateness
+        return self._close(self.watermark)
+
+    def _result(self, start):
+        count, regions, total, n = self._windows.pop(start)
+        self.emitted = max(self.emitted, start)
+        locations = dict(zip(self.matcher.regions, regions)) if self.matcher is not None else {}
+        return WindowResult(_as_datetime(start), _as_datetime(start + self.size), count, locations,
+                            total / n if n else None)
+
+    def _close(self, watermark):
+        """
+        Emit the windows that end at or before the watermark, oldest first
+        """
+        closed = sorted(s for s in self._windows if s + self.size <= watermark)
+        return [self._result(s) for s in closed]
+
+    def flush(self):
+        """
+        Emit every window still open, at the end of the feed
+        """
+        return [self._result(s) for s in sorted(self._windows)]
+
+    def open_windows(self):
+        return len(self._windows)
+
+
+def window_counts(array_iter, size=60, slide=None, lateness=10, countrylist=None, sentiment=None,
+                  time_column=3, location_column=2, text_column=0, skip_header=True, aggregator=None):
+    """
+    Generator function of windowed counts, for the end of a get_twitter_data chain
+    :param  array_iter: iterable of csv rows, for example get_twitter_data(filename)
+            size, slide, lateness, countrylist, sentiment: see WindowAggregator
+            time_column, location_column, text_column: columns of DateCreated, UserLocation and Tweet
+            skip_header: the first row is the header
+            aggregator: WindowAggregator to use instead of making one, to read its late and row counts
+    :yield  WindowResult of every window as soon as it closes, oldest first
+    """
+    aggregator = aggregator or WindowAggregator(size=size, slide=slide, lateness=lateness,
+                                                countrylist=countrylist, sentiment=sentiment)
+    for i, arr in enumerate(array_iter):
+        if i == 0 and skip_header:  # Skip header row
+            continue
+        t = parse_time(arr[time_column]) if len(arr) > time_column else None
+        if t is None:
+            continue
+        location = arr[location_column] if len(arr) > location_column else ''
+        text = arr[text_column] if len(arr) > text_column else ''
+        yield from aggregator.add(t, location, text)
+    yield from aggregator.flush()
@@ -0,0 +1,107 @@
+"""
+Record tweets from the twitter streaming api to a csv file
+StdOutListener does not need tweepy, so tweetreplay can feed it recorded tweets. tweepy is only imported
+by tweepy_listener and main, when a stream is actually opened.
+"""
+import argparse
+import time
+
+from asppsamples.twitter.hashtagcounter import SpaceSaving, encode_hashtags
+from asppsamples.twitter.tweetsink import BufferedCSVSink
+
+# Variables that contains the user credentials to access Twitter API
+access_token = "ENTERHERE"
+access_token_secret = "ENTERHERE"
+consumer_key = "ENTERHERE"
+consumer_secret = "ENTERHERE"
+
+
+# This is a basic listener that just prints received tweets to stdout.
+# For tweepy's Stream it is combined with tweepy's StreamListener, see tweepy_listener
+class StdOutListener:
+    def __init__(self, api=None, csvname='twitterfeed.csv', **sinkoptions):
+        super(StdOutListener, self).__init__()
+
+        # Create new file and write row headers.
+        # Rows are written in batches by a background thread, so on_status never waits for the disk
+        # sinkoptions: batchsize, flushinterval, maxbytes, maxage ... see BufferedCSVSink
+        self.csvname = csvname
+        self.sink = BufferedCSVSink(self.csvname,
+                                    ['Tweet', 'Hashtag', 'UserLocation', 'LocationX', 'LocationY',
+                                     'DateCreated', 'NumberofRetweets'], **sinkoptions)
+        self.hashtags = SpaceSaving(k=200)  # Trending hashtags so far, self.hashtags.top(10)
+
+    def on_status(self, status):
+        if status.retweeted:
+            return
+        if status.favorite_count is None:
+            return
+        if status.lang.find('en') < 0:
+            return
+
+        if status.coordinates is not None and status.entities.get('hashtags') != []:
+            x = status.coordinates['coordinates'][0]
+            y = status.coordinates['coordinates'][1]
+
+            # Save a few parameters into a csv file
+            location = status.user.location
+            text = status.text
+            created = status.created_at
+            retweets = status.retweet_count
+            tags = status.entities.get('hashtags')
+            hashtag = encode_hashtags(tags)  # json list of the hashtag texts
+            self.hashtags.update_many(tag['text'].casefold() for tag in tags)
+
+            print('Tweet arrived ! /n', status.text)
+
+            self.sink.put([text, hashtag, location, x, y, created, retweets])
+
+    def on_error(self, status_code):
+        print(status_code)
+        return False
+
+    def close(self):
+        """
+        Write the tweets still in the queue and close the file
+        """
+        self.sink.close()
+        self.sink.report()
+
+
+def tweepy_listener(api=None, csvname='twitterfeed.csv', **sinkoptions):
+    """
+    :return: StdOutListener that is also a tweepy StreamListener, for tweepy's Stream
+    """
+    from tweepy.streaming import StreamListener
+
+    listener = type('TweepyStdOutListener', (StdOutListener, StreamListener), {})
+    return listener(api=api, csvname=csvname, **sinkoptions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record tweets with coordinates and hashtags to a csv file')
+    parser.add_argument('--out', default='twitterfeed.csv', help='csv file to write')
+    args = parser.parse_args(argv)
+
+    from tweepy import OAuthHandler, Stream
+
+    # This handles Twitter authentification and the connection to Twitter Streaming API
+    l = tweepy_listener(csvname=args.out)
+    auth = OAuthHandler(consumer_key, consumer_secret)
+    auth.set_access_token(access_token, access_token_secret)
+    stream = Stream(auth, l)
+
+    # stream.filter(track=["trump", "clinton", "hillary clinton", "donald trump"])  ## Get feeds from all over the world
+    stream.filter(locations=[-180, -90, 180, 90], is_async=True)
+    try:
+        while stream.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.disconnect()
+        l.close()
+
+
+if __name__ == '__main__':
+    main()
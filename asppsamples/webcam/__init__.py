@@ -0,0 +1,25 @@
+"""
+Webcam streaming, analysis and display, imported on first use
+"""
+from asppsamples._lazy import attach
+
+_EXPORTS = {
+    '.threadedcapture': ['ThreadedCapture'],
+    '.framesources': ['open_source', 'SyntheticSource', 'ImageDirectorySource'],
+    '.imageintensity': ['IntensityEngine', 'frame_intensity'],
+    '.colorconversion': ['bgr_to_rgb_view', 'convert_bgr_to_rgb', 'RGBConverter'],
+    'asppsamples.ringbuffer': ['RingSeries'],
+    '.tracerenderer': ['TraceRenderer', 'setup_pyplot'],
+    '.renderscheduler': ['RenderScheduler'],
+    '.motiondetection': ['MotionDetector'],
+    '.ttltrigger': ['ThresholdTrigger', 'TriggerPath', 'open_serial'],
+    '.framestats': ['StageTimer'],
+    '.frameworkers': ['ProcessStage', 'parallel_map'],
+    '.streampipeline': ['Pipeline', 'Stage'],
+    '.sessionrecorder': ['SessionRecorder', 'SessionReader', 'SessionSource'],
+    '.offlineanalysis': ['analyze_video', 'load_trace'],
+    '.headless': ['run_headless'],
+    '.toolzstream': ['display_images', 'stream_frames'],
+}
+
+__getattr__, __dir__, __all__ = attach(__name__, _EXPORTS)
@@ -0,0 +1,122 @@
+"""
+BGR to RGB conversion for the webcam scripts
+Opencv gives frames in bgr order, matplotlib wants rgb. There are two cheap ways to get there:
+    view   - a reversed-stride view of the same memory, no copy at all. Fine for anything that
+             accepts non-contiguous arrays, such as imshow/set_data and np.mean
+    buffer - convert into a destination array owned by the caller and reused for every frame,
+             for consumers that need a contiguous rgb array
+
+python -m asppsamples.webcam.colorconversion times every method at a few resolutions.
+"""
+import timeit
+
+import cv2
+import numpy as np
+
+METHODS = ('view', 'numpy', 'opencv', 'fancy-index', 'opencv-new')
+RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+
+
+def bgr_to_rgb_view(bgr):
+    """
+    :param bgr: bgr image
+    :return: rgb view of the same memory (negative channel stride), changes when bgr changes
+    """
+    return bgr[:, :, ::-1]
+
+
+def convert_bgr_to_rgb(bgr, method='view', out=None):
+    """
+    This function converts image to RGB
+    :param  bgr: bgr image
+            method: 'view' for a zero-copy view,
+                    'numpy' or 'opencv' to convert into out (allocated if None),
+                    'fancy-index' and 'opencv-new' allocate a new array on every call, for comparison
+            out: destination rgb array with the same shape as bgr, reused between frames
+    :return: rgb image
+    """
+    if method == 'view':
+        return bgr_to_rgb_view(bgr)
+    if method == 'fancy-index':
+        return bgr[:, :, [2, 1, 0]]
+    if method == 'opencv-new':
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+    if out is None:
+        out = np.empty_like(bgr)
+    if method == 'numpy':
+        # One strided copy per channel is several times faster than copying the reversed view in one go
+        out[:, :, 0] = bgr[:, :, 2]
+        out[:, :, 1] = bgr[:, :, 1]
+        out[:, :, 2] = bgr[:, :, 0]
+    elif method == 'opencv':
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=out)
+    else:
+        raise ValueError(f'method must be one of {METHODS}, not {method!r}')
+    return out
+
+
+class RGBConverter:
+    def __init__(self, method='opencv'):
+        """
+        Converts every frame into the same destination buffer
+        :param method: 'numpy' or 'opencv'
+        """
+        if method not in ('numpy', 'opencv'):
+            raise ValueError("RGBConverter method must be 'numpy' or 'opencv'")
+        self.method = method
+        self.out = None
+
+    def __call__(self, bgr):
+        """
+        :param bgr: bgr image
+        :return: rgb image in the reused buffer, overwritten by the next call
+        """
+        if self.out is None or self.out.shape != bgr.shape:
+            self.out = np.empty_like(bgr)
+        return convert_bgr_to_rgb(bgr, method=self.method, out=self.out)
+
+
+def time_conversion(bgr, method, number=50, repeat=5):
+    """
+    :param bgr: bgr image
+    :param method: conversion method, see convert_bgr_to_rgb
+    :param number: calls per timing
+    :param repeat: number of timings
+    :return: best and median time per call in seconds
+    """
+    out = np.empty_like(bgr)
+    timer = timeit.Timer(lambda: convert_bgr_to_rgb(bgr, method=method, out=out))
+    times = np.array(timer.repeat(repeat=repeat, number=number)) / number
+    return times.min(), np.median(times)
+
+
+def benchmark_conversion(resolutions=RESOLUTIONS, methods=METHODS, number=50, repeat=5, seed=0):
+    """
+    Time every conversion method on random frames of each resolution
+    :param resolutions: (width, height) pairs
+    :param methods: conversion methods to time
+    :param number: calls per timing
+    :param repeat: number of timings, the best and the median are reported
+    :param seed: seed of the random frames, so runs are repeatable
+    :return: list of dictionaries with resolution, method, best and median milliseconds per frame
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for width, height in resolutions:
+        bgr = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for method in methods:
+            best, median = time_conversion(bgr, method, number=number, repeat=repeat)
+            results.append({'resolution': f'{width}x{height}', 'method': method,
+                            'best_ms': best * 1000, 'median_ms': median * 1000})
+    return results
+
+
+def print_benchmark(results):
+    print('{:>10} {:>12} {:>10} {:>10}'.format('size', 'method', 'best ms', 'median ms'))
+    for r in results:
+        print('{resolution:>10} {method:>12} {best_ms:10.4f} {median_ms:10.4f}'.format(**r))
+
+
+if __name__ == '__main__':
+    print_benchmark(benchmark_conversion())
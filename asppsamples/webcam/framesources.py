@@ -0,0 +1,219 @@
+"""
+Frame sources for the webcam scripts
+Every source behaves like a cv2.VideoCapture (read, get, isOpened, release), so stream_frames and
+ThreadedCapture work with any of them:
+    camera:0                   - live camera (cv2.VideoCapture)
+    video:session.mp4          - video file (cv2.VideoCapture)
+    images:somefolder          - image files in a folder, in name order
+    synthetic:640x480@30:sine  - generated frames, see SyntheticSource for the patterns
+    session:somefolder         - session recorded with sessionrecorder.SessionRecorder
+"""
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+PATTERNS = ('constant', 'ramp', 'sine', 'blink', 'noise')
+SOURCE_KINDS = ('camera', 'video', 'images', 'synthetic', 'session')
+
+
+class ImageDirectorySource:
+    def __init__(self, path, pattern='*', fps=30, loop=False):
+        """
+        :param path: folder with the images
+        :param pattern: glob pattern of the image files inside the folder
+        :param fps: frame rate reported by get(cv2.CAP_PROP_FPS)
+        :param loop: start again from the first image after the last one
+        """
+        self.files = sorted(f for f in glob.glob(os.path.join(path, pattern)) if os.path.isfile(f))
+        self.fps = fps
+        self.loop = loop
+        self.position = 0
+        self._opened = len(self.files) > 0
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        if self.position >= len(self.files):
+            if not self.loop:
+                return False, None
+            self.position = 0
+        frame = cv2.imread(self.files[self.position], cv2.IMREAD_COLOR)
+        self.position += 1
+        if frame is None:
+            return False, None
+        if image is not None and image.shape == frame.shape:
+            image[...] = frame
+            frame = image
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.files)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position
+        return 0
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+
+class SyntheticSource:
+    def __init__(self, width=640, height=480, fps=30, pattern='sine', period=2.0, low=20, high=200,
+                 nframes=None, realtime=False, seed=0):
+        """
+        Generated frames with a known brightness, for measuring the pipeline without a camera
+        :param width: frame width in pixels
+        :param height: frame height in pixels
+        :param fps: frame rate, used for the brightness pattern and when realtime is True
+        :param pattern: brightness over time -
+                        'constant' stays at high, 'ramp' goes from low to high every period,
+                        'sine' swings between low and high, 'blink' switches between low and high
+                        every half period, 'noise' is random pixels around the sine pattern
+        :param period: length of one cycle of the pattern in seconds
+        :param low: lowest brightness
+        :param high: highest brightness
+        :param nframes: number of frames before read returns False, None for no end
+        :param realtime: wait between frames so they arrive at fps, otherwise as fast as possible
+        :param seed: seed for the 'noise' pattern
+        """
+        if pattern not in PATTERNS:
+            raise ValueError(f'pattern must be one of {PATTERNS}, not {pattern!r}')
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pattern = pattern
+        self.period = period
+        self.low = low
+        self.high = high
+        self.nframes = nframes
+        self.realtime = realtime
+        self.position = 0
+        self._opened = True
+        self._rng = np.random.default_rng(seed)
+        self._noise = None
+        self._scratch = None
+        self._starttime = None
+
+    def brightness(self, framenumber):
+        """
+        :param framenumber: frame number
+        :return: brightness of that frame under the pattern
+        """
+        phase = (framenumber / self.fps) / self.period % 1.0
+        if self.pattern == 'constant':
+            return self.high
+        if self.pattern == 'ramp':
+            return self.low + (self.high - self.low) * phase
+        if self.pattern == 'blink':
+            return self.high if phase < 0.5 else self.low
+        return self.low + (self.high - self.low) * (0.5 + 0.5 * np.sin(2 * np.pi * phase))
+
+    def read(self, image=None):
+        if not self._opened or (self.nframes is not None and self.position >= self.nframes):
+            return False, None
+
+        if self.realtime:
+            if self._starttime is None:
+                self._starttime = time.perf_counter()
+            wait = self._starttime + self.position / self.fps - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+        shape = (self.height, self.width, 3)
+        if image is None or image.shape != shape:
+            image = np.empty(shape, dtype=np.uint8)
+        level = self.brightness(self.position)
+        if self.pattern == 'noise':
+            if self._noise is None:  # A few noise images, reused in turn
+                self._noise = self._rng.integers(-40, 41, size=(4,) + shape, dtype=np.int16)
+                self._scratch = np.empty(shape, dtype=np.int16)
+            np.add(self._noise[self.position % 4], int(level), out=self._scratch)
+            np.clip(self._scratch, 0, 255, out=self._scratch)
+            np.copyto(image, self._scratch, casting='unsafe')
+        else:
+            image.fill(int(level))
+        self.position += 1
+        return True, image
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.nframes or 0
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position
+        return 0
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+
+def parse_synthetic(spec):
+    """
+    :param spec: '640x480@30:sine', every part is optional ('', '1280x720', '@60', ':blink')
+    :return: keyword arguments for SyntheticSource
+    """
+    kwargs = {}
+    size, _, pattern = spec.partition(':')
+    size, _, fps = size.partition('@')
+    if size:
+        width, height = size.lower().split('x')
+        kwargs['width'], kwargs['height'] = int(width), int(height)
+    if fps:
+        kwargs['fps'] = float(fps)
+    if pattern:
+        kwargs['pattern'] = pattern
+    return kwargs
+
+
+def open_source(spec=0, **kwargs):
+    """
+    Open a frame source from a description
+    :param spec: 'camera:0', 'video:file.mp4', 'images:folder', 'synthetic:640x480@30:sine',
+                 'session:folder', a camera number, or a path to a video file, a folder of images
+                 or a recorded session
+    :param kwargs: extra arguments for ImageDirectorySource, SyntheticSource or SessionSource
+    :return: capture object with read, get, isOpened and release
+    """
+    if isinstance(spec, int):
+        return cv2.VideoCapture(spec)
+
+    kind, sep, value = spec.partition(':')
+    if not sep or kind not in SOURCE_KINDS:  # No prefix, or a path like C:\data\a.mp4. Guess from the value
+        value = spec
+        if spec.isdigit():
+            kind = 'camera'
+        elif os.path.isfile(os.path.join(spec, 'session.json')):
+            kind = 'session'
+        elif os.path.isdir(spec):
+            kind = 'images'
+        else:
+            kind = 'video'
+
+    if kind == 'camera':
+        return cv2.VideoCapture(int(value or 0))
+    if kind == 'video':
+        return cv2.VideoCapture(value)
+    if kind == 'images':
+        return ImageDirectorySource(value, **kwargs)
+    if kind == 'synthetic':
+        return SyntheticSource(**{**parse_synthetic(value), **kwargs})
+    if kind == 'session':
+        from asppsamples.webcam.sessionrecorder import SessionSource
+        return SessionSource(value, **kwargs)
+    raise ValueError(f'Unknown frame source {spec!r}')
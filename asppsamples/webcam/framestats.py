@@ -0,0 +1,103 @@
+"""
+Frame rate, per-stage latency and memory statistics for the webcam pipelines
+This is the 'collection FPS' printout of the display loops, extended with how long each stage of a
+frame took (percentiles over the most recent frames) and the peak memory of the process.
+"""
+import sys
+import time
+
+from asppsamples.ringbuffer import RingSeries
+
+try:
+    import resource
+except ImportError:  # Not available on windows
+    resource = None
+
+
+def peak_memory_mb():
+    """
+    :return: peak resident memory of this process in megabytes, or None if it cannot be measured
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # macOS reports bytes, linux kilobytes
+        return maxrss / (1024 * 1024)
+    return maxrss / 1024
+
+
+class StageTimer:
+    def __init__(self, stages, capacity=10000):
+        """
+        :param stages: names of the stages in the order they run for each frame
+        :param capacity: number of recent frames kept for the latency percentiles
+        """
+        self.stages = list(stages)
+        self.capacity = capacity
+        self.latency = {stage: RingSeries(capacity) for stage in self.stages}
+        self.frames = 0
+        self.starttime = None
+        self._mark = None
+
+    def start_frame(self):
+        """
+        Call at the start of each frame, before the first stage
+        """
+        now = time.perf_counter()
+        if self.starttime is None:
+            self.starttime = now
+        self._mark = now
+
+    def lap(self, stage):
+        """
+        Record the time since start_frame or the previous lap as the latency of stage
+        :param stage: name of the stage that just finished
+        """
+        now = time.perf_counter()
+        if stage not in self.latency:
+            self.stages.append(stage)
+            self.latency[stage] = RingSeries(self.capacity)
+        self.latency[stage].append(now - self._mark)
+        self._mark = now
+
+    def end_frame(self):
+        self.frames += 1
+
+    def elapsed(self):
+        if self.starttime is None:
+            return 0.0
+        return time.perf_counter() - self.starttime
+
+    def fps(self):
+        elapsed = self.elapsed()
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """
+        :param percentiles: latency percentiles to report
+        :return: dictionary with frames, elapsed seconds, fps, peak memory and
+                 for each stage the latency percentiles in milliseconds
+        """
+        stages = {}
+        for stage in self.stages:
+            latency = self.latency[stage].summary_ms(percentiles)
+            if latency:
+                stages[stage] = latency
+        return {'frames': self.frames, 'elapsed': self.elapsed(), 'fps': self.fps(),
+                'peak_memory_mb': peak_memory_mb(), 'stages': stages}
+
+    def report(self, percentiles=(50, 90, 99)):
+        """
+        Print the collection FPS followed by the latency of every stage
+        """
+        s = self.summary(percentiles)
+        print('The collection FPS was {:0.2f}'.format(s['fps']))
+        print('{} frames in {:0.2f} seconds'.format(s['frames'], s['elapsed']))
+        if s['stages']:
+            columns = [f'p{q}' for q in percentiles] + ['mean']
+            print('{:>12}'.format('stage (ms)') + ''.join('{:>9}'.format(col) for col in columns))
+            for stage, values in s['stages'].items():
+                print('{:>12}'.format(stage) + ''.join('{:9.3f}'.format(values[col]) for col in columns))
+        if s['peak_memory_mb'] is not None:
+            print('Peak memory {:0.1f} MB'.format(s['peak_memory_mb']))
+        return s
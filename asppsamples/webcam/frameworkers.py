@@ -0,0 +1,232 @@
+"""
+Process pool for per-frame analysis stages
+Frames are copied into slots of a shared memory slab that every worker process maps, and only the slot
+number is sent to the worker, so frames are never pickled. Results come back in frame order.
+When all slots are busy the producer waits for a worker to finish (overflow='block') or skips the
+analysis of that frame (overflow='skip'), so slow workers hold back the stream instead of filling memory.
+
+The analysis function runs in the worker processes, so it has to be picklable (a module level function
+or an object like IntensityEngine) and should not rely on state from earlier frames unless nworkers=1.
+"""
+import multiprocessing as mp
+import queue
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+OVERFLOW_POLICIES = ('block', 'skip')
+
+
+class SharedFramePool:
+    def __init__(self, nslots, shape, dtype=np.uint8, name=None):
+        """
+        Create (name=None) or attach to (name given) a slab of frame slots in shared memory
+        :param nslots: number of frames in the slab
+        :param shape: shape of one frame
+        :param dtype: dtype of the frames
+        :param name: name of an existing slab to attach to
+        """
+        self.nslots = nslots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        size = nslots * int(np.prod(self.shape)) * self.dtype.itemsize
+
+        # Worker processes share the resource tracker of the process that started them,
+        # so the slab is freed once, by its owner, in close
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.name = self.shm.name
+        self.frames = np.ndarray((nslots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def close(self):
+        """
+        Unmap the slab, and free it if this pool created it
+        """
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker(func, name, nslots, shape, dtype, tasks, results):
+    pool = SharedFramePool(nslots, shape, dtype, name=name)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot = task
+            try:
+                results.put((seq, slot, True, func(pool.frames[slot])))
+            except Exception as e:
+                results.put((seq, slot, False, repr(e)))
+    finally:
+        pool.close()
+
+
+class ProcessStage:
+    def __init__(self, func, nworkers=2, nslots=None, overflow='block', context=None):
+        """
+        :param func: analysis function, called as func(frame) in a worker process
+        :param nworkers: number of worker processes
+        :param nslots: number of frame slots in shared memory, defaults to twice the number of workers.
+                       This is also the most frames that can be in flight at once
+        :param overflow: 'block' waits for a free slot, 'skip' gives None as the result of frames
+                         that arrive while every slot is busy
+        :param context: multiprocessing start method ('fork', 'spawn', 'forkserver'), None for the default
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}, not {overflow!r}')
+        self.func = func
+        self.nworkers = nworkers
+        self.nslots = nslots or 2 * nworkers
+        self.overflow = overflow
+        self.ctx = mp.get_context(context)
+
+        # Counters
+        self.submitted = 0
+        self.completed = 0
+        self.skipped = 0
+        self.waits = 0  # times the producer had to wait for a free slot
+        self.waittime = 0.0
+
+        self.pool = None
+        self._workers = []
+        self._free = deque(range(self.nslots))
+        self._done = {}  # seq -> result, waiting to be handed out in order
+        self._nextseq = 0  # sequence number of the next submitted frame
+        self._nextout = 0  # sequence number of the next result to hand out
+
+    def _start(self, frame):
+        self.pool = SharedFramePool(self.nslots, frame.shape, frame.dtype)
+        self._tasks = self.ctx.Queue()
+        self._results = self.ctx.Queue()
+        for _ in range(self.nworkers):
+            p = self.ctx.Process(target=_worker, daemon=True,
+                                 args=(self.func, self.pool.name, self.nslots, frame.shape, frame.dtype,
+                                       self._tasks, self._results))
+            p.start()
+            self._workers.append(p)
+
+    def _collect(self, block):
+        """
+        Take one result from the workers and give its slot back
+        :param block: wait for a result if none is ready
+        :return: True if a result was collected
+        """
+        while True:
+            try:
+                seq, slot, ok, result = self._results.get(block=block, timeout=1.0 if block else None)
+                break
+            except queue.Empty:
+                if not block:
+                    return False
+                if any(p.exitcode is not None for p in self._workers):
+                    raise RuntimeError('A frame analysis worker exited unexpectedly')
+        if not ok:
+            raise RuntimeError(f'Frame analysis failed in worker for frame {seq}: {result}')
+        self._free.append(slot)
+        self._done[seq] = result
+        self.completed += 1
+        return True
+
+    def submit(self, frame):
+        """
+        Copy a frame into a free slot and queue it for the workers
+        :param frame: image, every frame must have the same shape and dtype
+        :return: sequence number of the frame
+        """
+        if self.pool is None:
+            self._start(frame)
+
+        while self._collect(block=False):  # Give back slots of finished frames
+            pass
+        if not self._free:
+            if self.overflow == 'skip':
+                seq = self._nextseq
+                self._nextseq += 1
+                self._done[seq] = None
+                self.skipped += 1
+                return seq
+            self.waits += 1
+            starttime = time.perf_counter()
+            self._collect(block=True)
+            self.waittime += time.perf_counter() - starttime
+
+        slot = self._free.popleft()
+        np.copyto(self.pool.frames[slot], frame)
+        seq = self._nextseq
+        self._nextseq += 1
+        self._tasks.put((seq, slot))
+        self.submitted += 1
+        return seq
+
+    def ready(self):
+        """
+        Generator of the results that are ready, in frame order
+        """
+        while self._nextout in self._done:
+            yield self._done.pop(self._nextout)
+            self._nextout += 1
+
+    def drain(self):
+        """
+        Generator of all remaining results, in frame order, waiting for the workers
+        """
+        while self._nextout < self._nextseq:
+            if self._nextout not in self._done:
+                self._collect(block=True)
+            yield from self.ready()
+
+    def map(self, frames):
+        """
+        Generator function that analyses a stream of frames in the worker processes
+        :param  frames: iterable of images
+        :yield  result of func for every frame, in frame order (None for skipped frames)
+        """
+        for frame in frames:
+            self.submit(frame)
+            yield from self.ready()
+        yield from self.drain()
+
+    def stats(self):
+        return {'submitted': self.submitted, 'completed': self.completed, 'skipped': self.skipped,
+                'inflight': self.nslots - len(self._free), 'waits': self.waits, 'waittime': self.waittime}
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory
+        """
+        for _ in self._workers:
+            self._tasks.put(None)
+        for p in self._workers:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        self._workers = []
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parallel_map(func, frames, nworkers=2, nslots=None, overflow='block'):
+    """
+    Generator function that applies func to every frame in a pool of worker processes
+    Fits into a tz.pipe chain: tz.pipe(ims, c.partial(parallel_map, engine), ...)
+    :param  func: picklable analysis function
+            frames: iterable of images
+            nworkers: number of worker processes
+            nslots: number of shared memory frame slots
+            overflow: 'block' or 'skip', see ProcessStage
+    :yield  func(frame) for every frame, in order
+    """
+    with ProcessStage(func, nworkers=nworkers, nslots=nslots, overflow=overflow) as stage:
+        yield from stage.map(frames)
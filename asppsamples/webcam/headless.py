@@ -0,0 +1,133 @@
+"""
+Headless run of the webcam pipeline
+Runs capture, intensity and (optionally) rendering on any frame source without opening a window,
+then reports the sustained FPS, the latency of each stage and the peak memory.
+Rendering is either off or done on the Agg backend, so it works on machines without a display.
+
+python -m asppsamples.webcam.headless --source synthetic:1280x720@30:sine --frames 500 --render agg
+"""
+import argparse
+
+import cv2
+
+from asppsamples.webcam.framesources import open_source
+from asppsamples.webcam.framestats import StageTimer
+from asppsamples.webcam.frameworkers import ProcessStage
+from asppsamples.webcam.colorconversion import bgr_to_rgb_view
+from asppsamples.webcam.imageintensity import IntensityEngine
+from asppsamples.webcam.motiondetection import MotionDetector
+from asppsamples.webcam.renderscheduler import RenderScheduler
+from asppsamples.ringbuffer import RingSeries
+from asppsamples.webcam.threadedcapture import ThreadedCapture
+from asppsamples.webcam.tracerenderer import TraceRenderer
+
+
+def run_headless(source='synthetic:640x480@30:sine', nframes=300, render='off', threaded=False,
+                 scale=0.8, x_width=50, threshold=40, workers=0, motion=False, displayfps=None):
+    """
+    Run the pipeline of toolzstream.py (WebcamStreamwithToolz.py) without a window
+    :param source: frame source description for open_source, or an open capture object
+    :param nframes: number of frames to process
+    :param render: 'off' to skip plotting, 'agg' to draw on the Agg backend
+    :param threaded: read the source on a background thread with ThreadedCapture
+    :param scale: resize factor applied to every frame, as in stream_frames
+    :param x_width: number of frames in the intensity trace
+    :param threshold: intensity threshold of the trace
+    :param workers: number of worker processes for the intensity stage, 0 computes it inline
+    :param motion: add the motion detection stage
+    :param displayfps: most draws per second with render 'agg', None draws every frame
+    :return: summary dictionary from StageTimer, with the analyzed and rendered FPS under 'display' when rendering
+    """
+    if render not in ('off', 'agg'):
+        raise ValueError(f"render must be 'off' or 'agg', not {render!r}")
+
+    capture = open_source(source) if isinstance(source, (str, int)) else source
+    if threaded:
+        capture = ThreadedCapture(capture, overflow='block')
+
+    stages = ['capture', 'resize', 'intensity'] + (['motion'] if motion else [])
+    detector = MotionDetector() if motion else None
+    renderer = None
+    scheduler = None
+    if render == 'agg':
+        import matplotlib.pyplot as plt
+        plt.switch_backend('Agg')
+        _, ax = plt.subplots(1, 2, figsize=(10, 5))
+        stages += ['render']
+
+        def draw(frame, n):
+            nonlocal renderer
+            rgb = bgr_to_rgb_view(frame)
+            if renderer is None:
+                renderer = TraceRenderer(imageaxis=ax[0], traceaxis=ax[1], image=rgb, threshold=threshold)
+            renderer.update(series=history, image=rgb, title=f'Frame Number {n}')
+
+        scheduler = RenderScheduler(draw, fps=displayfps)
+
+    engine = IntensityEngine(mode='exact')
+    history = RingSeries(capacity=x_width)
+    timer = StageTimer(stages)
+    stage = ProcessStage(engine, nworkers=workers) if workers else None
+
+    try:
+        for n in range(nframes):
+            timer.start_frame()
+            ret, frame = capture.read()
+            if not ret:
+                break
+            timer.lap('capture')
+
+            if scale != 1:
+                frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+            timer.lap('resize')
+
+            if stage is None:
+                history.append(engine(frame))
+            else:  # Results arrive a few frames later, in order
+                stage.submit(frame)
+                for imageintensity in stage.ready():
+                    history.append(imageintensity)
+            timer.lap('intensity')
+
+            if detector is not None:
+                detector(frame)
+                timer.lap('motion')
+
+            if scheduler is not None:
+                scheduler.update(frame=frame, n=n)  # Drawn when due, conversion included
+                timer.lap('render')
+            timer.end_frame()
+        if stage is not None:
+            for imageintensity in stage.drain():
+                history.append(imageintensity)
+    finally:
+        capture.release()
+        if stage is not None:
+            stage.close()
+            print('Intensity workers: {submitted} frames, waited {waits} times for a free slot'.format(
+                **stage.stats()))
+
+    summary = timer.report()
+    if scheduler is not None:
+        scheduler.flush()
+        summary['display'] = scheduler.report()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the webcam pipeline without a window')
+    parser.add_argument('--source', default='synthetic:640x480@30:sine',
+                        help='camera:0, video:file, images:folder, session:folder or synthetic:WxH@FPS:pattern')
+    parser.add_argument('--frames', type=int, default=300, help='number of frames to process')
+    parser.add_argument('--render', choices=('off', 'agg'), default='off')
+    parser.add_argument('--threaded', action='store_true', help='read frames on a background thread')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes for the intensity stage')
+    parser.add_argument('--motion', action='store_true', help='add the motion detection stage')
+    parser.add_argument('--display-fps', type=float, default=None, help='most draws per second, default every frame')
+    args = parser.parse_args(argv)
+    run_headless(source=args.source, nframes=args.frames, render=args.render, threaded=args.threaded,
+                 workers=args.workers, motion=args.motion, displayfps=args.display_fps)
+
+
+if __name__ == '__main__':
+    main()
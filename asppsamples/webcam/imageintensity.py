@@ -0,0 +1,127 @@
+"""
+Frame intensity for the webcam scripts
+The intensity is the mean over all pixels and channels, which does not depend on the channel order,
+so it is computed on the raw bgr frame from opencv without converting it to rgb first.
+Sums are taken with cv2.sumElems, which accumulates the uint8 pixels as integers instead of
+upcasting the whole frame to float64 like np.mean does.
+
+Modes:
+    exact     - every pixel
+    subsample - every step-th row of the frame
+    roi       - only the pixels inside roi = (x, y, width, height)
+    channels  - every pixel, returns the mean of each channel (blue, green, red)
+"""
+import time
+
+import cv2
+import numpy as np
+
+MODES = ('exact', 'subsample', 'roi', 'channels')
+
+
+class IntensityEngine:
+    def __init__(self, mode='exact', step=4, roi=None):
+        """
+        :param mode: one of 'exact', 'subsample', 'roi' or 'channels'
+        :param step: row stride for mode 'subsample'
+        :param roi: (x, y, width, height) of the region used in mode 'roi'
+        """
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}, not {mode!r}')
+        if mode == 'roi' and roi is None:
+            raise ValueError("mode 'roi' needs roi=(x, y, width, height)")
+        if step < 1:
+            raise ValueError('step must be at least 1')
+
+        self.mode = mode
+        self.step = int(step)
+        self.roi = roi
+        self.channelmeans = np.zeros(3, dtype=np.float64)  # Reused output of every call
+
+    def region(self, frame):
+        """
+        :param frame: bgr image
+        :return: the part of the frame used by this mode, always a view
+        """
+        if self.mode == 'subsample':
+            return frame[::self.step]
+        if self.mode == 'roi':
+            x, y, w, h = self.roi
+            return frame[y:y + h, x:x + w]
+        return frame
+
+    def __call__(self, frame):
+        """
+        :param frame: bgr (or rgb, or gray) image
+        :return: imageintensity: average intensity of the frame,
+                 or the average of each channel in mode 'channels' (a reused array)
+        """
+        region = self.region(frame)
+        sums = cv2.sumElems(region)
+        npixels = region.shape[0] * region.shape[1]
+        nchannels = region.shape[2] if region.ndim == 3 else 1
+
+        for ch in range(3):
+            self.channelmeans[ch] = sums[min(ch, nchannels - 1)] / npixels
+        if self.mode == 'channels':
+            return self.channelmeans
+        return (sums[0] + sums[1] + sums[2] + sums[3]) / (npixels * nchannels)
+
+
+_default_engine = IntensityEngine()
+
+
+def frame_intensity(frame):
+    """
+    Exact average intensity of a frame
+    :param frame: bgr image
+    :return: imageintensity: average intensity of image
+    """
+    return _default_engine(frame)
+
+
+def compare_modes(frame, repeat=50, step=4, roi=None):
+    """
+    Time every mode on a frame and compare the result to the exact intensity.
+    The first row is the old way, cv2.cvtColor followed by np.mean
+    :param frame: bgr image
+    :param repeat: number of timed calls per mode
+    :param step: row stride for mode 'subsample'
+    :param roi: region for mode 'roi', defaults to the central quarter of the frame
+    :return: list of dictionaries with mode, milliseconds per frame, intensity and absolute error
+    """
+    if roi is None:
+        h, w = frame.shape[:2]
+        roi = (w // 4, h // 4, w // 2, h // 2)
+
+    methods = [('cvtColor+np.mean', lambda x: np.mean(cv2.cvtColor(x, cv2.COLOR_BGR2RGB)))]
+    for mode in ('exact', 'subsample', 'roi'):
+        methods.append((mode, IntensityEngine(mode=mode, step=step, roi=roi)))
+    channels = IntensityEngine(mode='channels')
+    methods.append(('channels', lambda x: channels(x).mean()))
+
+    exact = frame_intensity(frame)
+    results = []
+    for name, method in methods:
+        starttime = time.perf_counter()
+        for _ in range(repeat):
+            value = method(frame)
+        elapsed = (time.perf_counter() - starttime) / repeat
+        results.append({'mode': name, 'ms': elapsed * 1000, 'intensity': float(value),
+                        'error': abs(float(value) - exact)})
+    return results
+
+
+def print_comparison(results):
+    print('{:>18} {:>10} {:>10} {:>8}'.format('mode', 'ms/frame', 'intensity', 'error'))
+    for r in results:
+        print('{mode:>18} {ms:10.4f} {intensity:10.3f} {error:8.3f}'.format(**r))
+
+
+if __name__ == '__main__':
+    capture = cv2.VideoCapture(0)
+    ret, image = capture.read()
+    capture.release()
+    if not ret:  # No camera, use a noise frame at 720p
+        image = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    print_comparison(compare_modes(image))
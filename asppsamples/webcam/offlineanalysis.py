@@ -0,0 +1,197 @@
+"""
+Offline intensity analysis of recorded sessions
+The video is read into fixed size blocks of frames, held in one reused 4-D uint8 array
+(frames, height, width, channels). Per-frame intensity, per-channel means and threshold crossings are
+computed with one reduction per block instead of one np.mean per frame.
+The result is the intensity trace that plot_intensity shows live, written to a csv file.
+
+python -m asppsamples.webcam.offlineanalysis session.mp4 --threshold 40 --trace session_trace.csv
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from asppsamples.webcam.framesources import open_source
+
+TRACE_HEADER = 'Frame,Time,Intensity,Blue,Green,Red,AboveThreshold'
+
+
+def _bgr_conversion(frame):
+    """
+    :return: cv2 color conversion code that turns frames like this one into bgr, None if they are bgr
+    """
+    if frame.ndim == 2 or frame.shape[2] == 1:
+        return cv2.COLOR_GRAY2BGR
+    if frame.shape[2] == 4:
+        return cv2.COLOR_BGRA2BGR
+    return None
+
+
+def read_blocks(video_capture, blocksize=32):
+    """
+    Generator function that reads frames into blocks
+    The same block array is filled again for every block, so use each block before asking for the next
+    Grayscale and bgra frames are converted to bgr as they are read, so every block has three channels
+    :param video_capture: opencv capture object or any frame source
+    :param blocksize: number of frames per block
+    :yield  startframe: number of the first frame in the block
+            block: array of shape (frames, height, width, 3), shorter for the last block
+    """
+    ret, frame = video_capture.read()
+    if not ret:
+        return
+    conversion = _bgr_conversion(frame)
+    block = np.empty((blocksize,) + frame.shape[:2] + (3,), dtype=np.uint8)
+    if conversion is None:
+        block[0] = frame
+    else:
+        cv2.cvtColor(frame, conversion, dst=block[0])
+    n = 1
+    startframe = 0
+    while True:
+        while n < blocksize:
+            if conversion is None:
+                ret, frame = video_capture.read(block[n])  # Opencv decodes straight into the block
+                if ret and frame is not block[n]:
+                    block[n] = frame
+            else:
+                ret, frame = video_capture.read()
+                if ret:
+                    cv2.cvtColor(frame, conversion, dst=block[n])
+            if not ret:
+                break
+            n += 1
+        if n:
+            yield startframe, block[:n]
+        if n < blocksize:
+            return
+        startframe += n
+        n = 0
+
+
+class BlockAnalyzer:
+    def __init__(self, threshold=40):
+        """
+        :param threshold: intensity threshold for the crossings, same as in plot_intensity
+        """
+        self.threshold = threshold
+        self._columns = None  # per-block column sums, reused
+        self._previous = None  # was the last frame of the previous block above threshold
+
+    def analyze(self, block):
+        """
+        :param block: uint8 array of shape (frames, height, width, 3)
+        :return: intensity: average intensity of every frame
+                 channels: average of every channel (blue, green, red) for every frame
+                 above: True where intensity is above threshold
+                 crossings: (index in block, +1 going above / -1 going below) for every threshold crossing
+        """
+        n, height, width, nchannels = block.shape
+        if self._columns is None or self._columns.shape[0] < n or self._columns.shape[1] != width * nchannels:
+            self._columns = np.empty((block.shape[0], width * nchannels), dtype=np.uint32)
+        columns = self._columns[:n]
+
+        # Sum down the rows first (contiguous, integer accumulation, fits uint32 for any height below 16M),
+        # then across the columns of each channel
+        np.add.reduce(block.reshape(n, height, width * nchannels), axis=1, dtype=np.uint32, out=columns)
+        sums = columns.reshape(n, width, nchannels).sum(axis=1, dtype=np.uint64)
+
+        channels = sums / float(height * width)
+        intensity = channels.mean(axis=1)
+
+        above = intensity > self.threshold
+        previous = above[0] if self._previous is None else self._previous
+        change = np.diff(above.astype(np.int8), prepend=np.int8(previous))
+        index = np.flatnonzero(change)
+        crossings = np.column_stack((index, change[index]))
+        self._previous = above[-1]
+        return intensity, channels, above, crossings
+
+
+def analyze_video(source, threshold=40, blocksize=32, tracefile=None):
+    """
+    Compute the intensity trace of a recorded session
+    :param source: video file, frame source description for open_source, or an open capture object
+    :param threshold: intensity threshold
+    :param blocksize: number of frames analysed at once
+    :param tracefile: csv file for the trace, None to only return it
+    :return: dictionary with the trace (intensity, channels, above), the crossings as
+             (frame, direction) rows, the number of frames and the processing rate
+    """
+    capture = open_source(source) if isinstance(source, (str, int)) else source
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30
+
+    analyzer = BlockAnalyzer(threshold=threshold)
+    intensity, channels, above, crossings = [], [], [], []
+    starttime = time.perf_counter()
+
+    f = open(tracefile, 'w') if tracefile else None
+    try:
+        if f:
+            f.write(TRACE_HEADER + '\n')
+        for startframe, block in read_blocks(capture, blocksize=blocksize):
+            i, ch, a, cross = analyzer.analyze(block)
+            frames = np.arange(startframe, startframe + len(i))
+            if f:
+                np.savetxt(f, np.column_stack((frames, frames / fps, i, ch, a)),
+                           fmt=['%d', '%.4f', '%.3f', '%.3f', '%.3f', '%.3f', '%d'], delimiter=',')
+            intensity.append(i)
+            channels.append(ch)
+            above.append(a)
+            cross[:, 0] += startframe
+            crossings.append(cross)
+    finally:
+        if f:
+            f.close()
+        capture.release()
+
+    elapsed = time.perf_counter() - starttime
+    nframes = int(sum(len(i) for i in intensity))
+    return {'intensity': np.concatenate(intensity) if intensity else np.empty(0),
+            'channels': np.concatenate(channels) if channels else np.empty((0, 3)),
+            'above': np.concatenate(above) if above else np.empty(0, dtype=bool),
+            'crossings': np.concatenate(crossings) if crossings else np.empty((0, 2), dtype=np.int64),
+            'frames': nframes, 'fps': fps,
+            'processing_fps': nframes / elapsed if elapsed > 0 else 0.0}
+
+
+def load_trace(tracefile):
+    """
+    :param tracefile: csv file written by analyze_video
+    :return: structured array with the columns of TRACE_HEADER
+    """
+    return np.genfromtxt(tracefile, delimiter=',', names=True)
+
+
+def plot_trace(axis, intensity, threshold=40):
+    """
+    Plot a whole trace the way plot_intensity colours it, red below and blue above threshold
+    :param axis: figure axis for plotting
+    :param intensity: average intensity of every frame
+    :param threshold: intensity threshold
+    """
+    intensity = np.asarray(intensity, dtype=np.float64)
+    frames = np.arange(len(intensity))
+    axis.plot(frames, np.where(intensity < threshold, intensity, np.nan), '-', color='r')
+    axis.plot(frames, np.where(intensity > threshold, intensity, np.nan), '-', color='b')
+    axis.set_ylabel('Average Intensity')
+    axis.set_xlabel('Frames')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Intensity trace of a recorded session')
+    parser.add_argument('source', help='video file or frame source description')
+    parser.add_argument('--threshold', type=float, default=40)
+    parser.add_argument('--blocksize', type=int, default=32, help='frames analysed at once')
+    parser.add_argument('--trace', default='trace.csv', help='csv file for the trace')
+    args = parser.parse_args(argv)
+
+    result = analyze_video(args.source, threshold=args.threshold, blocksize=args.blocksize, tracefile=args.trace)
+    print('Analysed {} frames at {:0.1f} frames per second'.format(result['frames'], result['processing_fps']))
+    print('{} threshold crossings, trace written to {}'.format(len(result['crossings']), args.trace))
+
+
+if __name__ == '__main__':
+    main()
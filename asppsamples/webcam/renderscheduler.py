@@ -0,0 +1,115 @@
+"""
+Draw at display rate while every frame is analyzed
+Drawing a matplotlib figure takes tens of milliseconds, longer than a camera frame. When every frame is
+drawn the whole loop runs at drawing speed and frames are missed. RenderScheduler is told about every
+analyzed frame, keeps only the newest state and draws it when a draw is due:
+    fps     - at most fps draws per second
+    budget  - at most budget seconds of drawing per analyzed frame, on average. With budget=0.005 and
+              draws of 40 ms, one frame in eight is drawn, however fast the frames come
+The states in between are coalesced, their data is already in the trace (RingSeries) and only the
+newest image is shown. Analyzed and rendered frames per second are reported separately.
+
+    scheduler = RenderScheduler(lambda image: renderer.update(series=history, image=image), fps=30)
+    for frame in frames:
+        history.append(engine(frame))          # every frame
+        scheduler.update(image=frame)          # drawn when due
+    scheduler.flush()                          # draw the last state
+    scheduler.report()
+"""
+import time
+
+from asppsamples.ringbuffer import RingSeries
+
+
+class RenderScheduler:
+    def __init__(self, draw, fps=30, budget=None):
+        """
+        :param draw: function that draws, called with the newest state as keyword arguments
+        :param fps: most draws per second, None for no limit
+        :param budget: most seconds of drawing per analyzed frame, None for no limit
+        """
+        self.draw = draw
+        self.fps = fps
+        self.budget = budget
+
+        # Counters
+        self.analyzed = 0
+        self.rendered = 0
+        self.drawtime = RingSeries(10000)  # seconds per draw
+        self.starttime = None
+
+        self._state = {}
+        self._pending = False  # state changed since the last draw
+        self._lastdraw = None
+        self._sincedraw = 0  # frames analyzed since the last draw
+        self._average = 0.0  # moving average of the draw time
+
+    def due(self, now=None):
+        """
+        :return: True if a draw is allowed now
+        """
+        if self._lastdraw is None:
+            return True
+        now = time.perf_counter() if now is None else now
+        if self.fps and now - self._lastdraw < 1 / self.fps:
+            return False
+        return not self.budget or self._sincedraw * self.budget >= self._average
+
+    def update(self, **state):
+        """
+        Called for every analyzed frame
+        :param state: keyword arguments for draw, they replace those of earlier frames
+        :return: True if the frame was drawn
+        """
+        now = time.perf_counter()
+        if self.starttime is None:
+            self.starttime = now
+        self.analyzed += 1
+        self._sincedraw += 1
+        self._state.update(state)
+        self._pending = True
+        if not self.due(now):
+            return False
+        self._draw()
+        return True
+
+    def _draw(self):
+        starttime = time.perf_counter()
+        self.draw(**self._state)
+        done = time.perf_counter()
+        seconds = done - starttime
+        self.drawtime.append(seconds)
+        self._average = seconds if not self.rendered else 0.8 * self._average + 0.2 * seconds
+        self.rendered += 1
+        self._lastdraw = done
+        self._sincedraw = 0
+        self._pending = False
+
+    def flush(self):
+        """
+        Draw the newest state if it was not drawn yet, at the end of a stream
+        """
+        if self._pending:
+            self._draw()
+
+    def stats(self, percentiles=(50, 90, 99)):
+        """
+        :return: dictionary with analyzed and rendered frames and frames per second, and the draw time
+                 percentiles in milliseconds
+        """
+        elapsed = time.perf_counter() - self.starttime if self.starttime is not None else 0.0
+        s = {'analyzed': self.analyzed, 'rendered': self.rendered, 'coalesced': self.analyzed - self.rendered,
+             'analyzed_fps': self.analyzed / elapsed if elapsed > 0 else 0.0,
+             'rendered_fps': self.rendered / elapsed if elapsed > 0 else 0.0}
+        if len(self.drawtime):
+            s['draw_ms'] = self.drawtime.summary_ms(percentiles)
+        return s
+
+    def report(self):
+        s = self.stats()
+        print('Analyzed {analyzed} frames at {analyzed_fps:0.2f} FPS, rendered {rendered} '
+              'at {rendered_fps:0.2f} FPS'.format(**s))
+        if 'draw_ms' in s:
+            print('Draw time (ms): p50 {p50:0.2f}  p90 {p90:0.2f}  p99 {p99:0.2f}  mean {mean:0.2f}'.format(
+                **s['draw_ms']))
+        return s
@@ -0,0 +1,389 @@
+"""
+Record the frames of a webcam session to disk and play them back
+SessionRecorder.put only copies the frame onto a queue. A writer thread appends the frames to chunk files
+of chunkframes frames each, and writes one index record per frame with its time, intensity, chunk and
+position in the chunk. A session is a folder:
+    session.json        - frame shape and dtype, chunk size, compression
+    index.bin           - index records (INDEX_DTYPE), one per frame
+    chunk-000000.raw    - raw frames, read back with np.memmap
+    chunk-000000.z      - the same, zlib compressed, when compress is set
+
+SessionReader gets any frame, or the frame at any time, without reading the frames before it.
+SessionSource plays a session back like a cv2.VideoCapture, as fast as the disk allows or at the recorded
+pace, so open_source('session:somefolder') re-runs the analysis on a recorded session.
+
+    recorder = SessionRecorder('session1')
+    pipeline = Pipeline(Stage('record', recorder.put, do=True), ...)
+    recorder.close()
+    SessionReader('session1').at_time(12.5)   # frame 12.5 seconds into the session
+"""
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+
+import cv2
+import numpy as np
+
+from asppsamples.webcam.imageintensity import frame_intensity
+from asppsamples.ringbuffer import RingSeries
+
+INDEX_DTYPE = np.dtype([('time', '<f8'), ('intensity', '<f8'), ('chunk', '<i4'), ('slot', '<i4')])
+OVERFLOW_POLICIES = ('block', 'drop')
+_STOP = object()
+
+
+def _chunk_name(path, chunk, compress):
+    return os.path.join(path, 'chunk-{:06d}.{}'.format(chunk, 'z' if compress else 'raw'))
+
+
+class SessionRecorder:
+    def __init__(self, path, chunkframes=100, compress=None, maxqueue=64, overflow='block', fps=None):
+        """
+        :param path: folder of the session, created if needed. An earlier session in it is replaced
+        :param chunkframes: frames per chunk file
+        :param compress: zlib level 1-9 for compressed chunks, None for raw chunks that can be memory mapped
+        :param maxqueue: most frames waiting to be written
+        :param overflow: 'block' makes put wait when the queue is full, 'drop' drops the frame and counts it
+        :param fps: frame rate of the source, stored with the session
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}, not {overflow!r}')
+        self.path = path
+        self.chunkframes = max(1, int(chunkframes))
+        self.compress = compress
+        self.overflow = overflow
+        self.fps = fps
+        self.shape = None
+        self.dtype = None
+
+        # Counters
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.bytes = 0  # bytes in the chunk files
+        self.maxdepth = 0
+        self.writelatency = RingSeries(10000)  # seconds to write one frame
+        self.framelatency = RingSeries(10000)  # seconds from put to written
+
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith('chunk-') or name in ('index.bin', 'session.json'):
+                os.remove(os.path.join(path, name))
+        self._index = open(os.path.join(path, 'index.bin'), 'wb')
+        self._records = []  # index records not yet written to index.bin
+        self._chunk = 0
+        self._slot = 0  # frames in the chunk being written
+        self._file = None  # raw chunk file
+        self._buffer = None  # compressed chunk, before compression
+        self._queue = queue.Queue(maxsize=maxqueue)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='SessionRecorder', daemon=True)
+        self._thread.start()
+
+    def _write_meta(self, closed=False):
+        meta = {'shape': list(self.shape) if self.shape is not None else None,
+                'dtype': self.dtype.str if self.dtype is not None else None,
+                'chunkframes': self.chunkframes, 'compress': self.compress, 'fps': self.fps,
+                'frames': self.written, 'dropped': self.dropped, 'closed': closed}
+        with open(os.path.join(self.path, 'session.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    def _end_chunk(self):
+        """
+        Finish the chunk being written and make its frames visible in the index
+        """
+        if self.compress is not None:
+            if self._buffer:
+                data = zlib.compress(bytes(self._buffer), self.compress)
+                with open(_chunk_name(self.path, self._chunk, True), 'wb') as f:
+                    f.write(data)
+                self.bytes += len(data)
+            self._buffer = None
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+        self._flush_index()
+        self._chunk += 1
+        self._slot = 0
+
+    def _flush_index(self):
+        if self._records:
+            self._index.write(np.array(self._records, dtype=INDEX_DTYPE).tobytes())
+            self._index.flush()
+            self._records = []
+
+    def _write(self, queuedtime, frame, timestamp, intensity):
+        starttime = time.perf_counter()
+        if intensity is None:
+            intensity = frame_intensity(frame)
+        if self.compress is not None:
+            if self._buffer is None:
+                self._buffer = bytearray()
+            self._buffer += frame.tobytes()
+        else:
+            if self._file is None:
+                self._file = open(_chunk_name(self.path, self._chunk, False), 'wb')
+            self._file.write(frame.tobytes())
+            self.bytes += frame.nbytes
+        self._records.append((timestamp, float(intensity), self._chunk, self._slot))
+        self._slot += 1
+        self.written += 1
+        if self._slot >= self.chunkframes:
+            self._end_chunk()
+        elif self.compress is None and self._queue.empty():  # Raw frames can be read back while recording
+            self._file.flush()
+            self._flush_index()
+        done = time.perf_counter()
+        self.writelatency.append(done - starttime)
+        self.framelatency.append(done - queuedtime)
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                self._write(*item)
+            self._end_chunk()
+        except Exception as e:
+            self._error = e
+        finally:
+            if self._file is not None:
+                self._file.close()
+            self._index.close()
+            self._write_meta(closed=True)
+
+    def put(self, frame, timestamp=None, intensity=None, copy=True):
+        """
+        Queue a frame for writing, called from the capture loop
+        :param frame: image, every frame of a session has the same shape and dtype
+        :param timestamp: seconds since 1970, None for now
+        :param intensity: intensity of the frame, None to compute it on the writer thread
+        :param copy: copy the frame, needed when the caller reuses its buffer
+        :return: True if the frame was queued, False if it was dropped
+        """
+        if self._error is not None:
+            raise RuntimeError(f'session writer thread failed: {self._error!r}')
+        if self.shape is None:
+            self.shape, self.dtype = frame.shape, frame.dtype
+            self._write_meta()
+        elif frame.shape != self.shape or frame.dtype != self.dtype:
+            raise ValueError(f'Frame of shape {frame.shape} {frame.dtype}, the session has {self.shape} {self.dtype}')
+        item = (time.perf_counter(), np.array(frame, copy=True) if copy else frame,
+                time.time() if timestamp is None else timestamp, intensity)
+        try:
+            self._queue.put(item, block=self.overflow == 'block')
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        depth = self._queue.qsize()
+        if depth > self.maxdepth:
+            self.maxdepth = depth
+        return True
+
+    def close(self, timeout=30.0):
+        """
+        Write every queued frame, finish the last chunk and stop the writer thread
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        if self._error is not None:
+            raise RuntimeError(f'session writer thread failed: {self._error!r}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def metrics(self, percentiles=(50, 90, 99)):
+        """
+        :return: dictionary with the queue depth, frame counts, bytes written and the write and frame
+                 latency percentiles in milliseconds
+        """
+        latency = {}
+        for name, series in (('write', self.writelatency), ('frame', self.framelatency)):
+            if len(series):
+                latency[name] = series.summary_ms(percentiles, mean=False, maximum=True)
+        return {'depth': self._queue.qsize(), 'maxdepth': self.maxdepth, 'queued': self.queued,
+                'written': self.written, 'dropped': self.dropped, 'bytes': self.bytes, 'latency_ms': latency}
+
+    def report(self):
+        m = self.metrics()
+        print('Frames queued {queued}, written {written}, dropped {dropped}, {:0.1f} MB'.format(m['bytes'] / 1e6, **m))
+        print('Queue depth {depth}, max {maxdepth}'.format(**m))
+        for name, values in m['latency_ms'].items():
+            print('{:>6} latency (ms): p50 {p50:0.2f}  p90 {p90:0.2f}  p99 {p99:0.2f}  max {max:0.2f}'.format(
+                name, **values))
+        return m
+
+
+class SessionReader:
+    def __init__(self, path, cachechunks=4):
+        """
+        Random access to the frames of a recorded session
+        :param path: folder of the session
+        :param cachechunks: chunks kept open (raw) or decompressed (compressed) at a time
+        """
+        with open(os.path.join(path, 'session.json')) as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.shape = tuple(self.meta['shape'] or ())
+        self.dtype = np.dtype(self.meta['dtype'] or 'u1')
+        self.compress = self.meta['compress']
+        self.cachechunks = max(1, cachechunks)
+        self._chunks = {}  # chunk number -> array of its frames, oldest used first
+        self.refresh()
+
+    def refresh(self):
+        """
+        Read the index again, to see frames written since the reader was opened
+        """
+        self.index = np.fromfile(os.path.join(self.path, 'index.bin'), dtype=INDEX_DTYPE)
+        self._chunks.clear()  # The last raw chunk may have grown
+        return len(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def times(self):
+        """
+        :return: time of every frame in seconds since the first frame
+        """
+        return self.index['time'] - self.index['time'][0] if len(self.index) else self.index['time']
+
+    @property
+    def intensities(self):
+        return self.index['intensity']
+
+    @property
+    def fps(self):
+        """
+        :return: recorded frame rate, from the source or the frame times
+        """
+        if self.meta.get('fps'):
+            return self.meta['fps']
+        if len(self.index) > 1:
+            return float(1 / np.median(np.diff(self.index['time'])))
+        return 30.0
+
+    def _chunk(self, chunk):
+        frames = self._chunks.pop(chunk, None)
+        if frames is None:
+            fname = _chunk_name(self.path, chunk, self.compress is not None)
+            framebytes = int(np.prod(self.shape)) * self.dtype.itemsize
+            if self.compress is not None:
+                with open(fname, 'rb') as f:
+                    data = zlib.decompress(f.read())
+                frames = np.frombuffer(data, dtype=self.dtype).reshape((-1,) + self.shape)
+            else:
+                count = os.path.getsize(fname) // framebytes
+                frames = np.memmap(fname, dtype=self.dtype, mode='r', shape=(count,) + self.shape)
+            if len(self._chunks) >= self.cachechunks:
+                del self._chunks[next(iter(self._chunks))]
+        self._chunks[chunk] = frames  # Most recently used last
+        return frames
+
+    def frame(self, i):
+        """
+        :param i: frame number, negative counts from the end
+        :return: the frame, a read-only array
+        """
+        record = self.index[i]
+        return self._chunk(int(record['chunk']))[int(record['slot'])]
+
+    def __getitem__(self, i):
+        return self.frame(i)
+
+    def find_time(self, seconds):
+        """
+        :param seconds: time since the first frame
+        :return: number of the first frame at or after that time, len(self) past the end
+        """
+        return int(np.searchsorted(self.times, seconds, side='left'))
+
+    def at_time(self, seconds):
+        """
+        :return: the frame shown at seconds after the first frame, the last one before or at that time
+        """
+        i = int(np.searchsorted(self.times, seconds, side='right')) - 1
+        return self.frame(max(i, 0))
+
+
+class SessionSource:
+    def __init__(self, path, realtime=False, loop=False, start=0):
+        """
+        Play back a recorded session like a cv2.VideoCapture, for open_source('session:folder')
+        :param path: folder of the session
+        :param realtime: wait between frames as they were recorded, otherwise as fast as the disk allows
+        :param loop: start again from the first frame after the last one
+        :param start: first frame
+        """
+        self.reader = SessionReader(path)
+        self.realtime = realtime
+        self.loop = loop
+        self.position = start
+        self._opened = len(self.reader) > 0
+        self._starttime = None
+        self._startframe = start
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        if self.position >= len(self.reader):
+            if not self.loop:
+                return False, None
+            self.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+        if self.realtime:
+            times = self.reader.times
+            if self._starttime is None:
+                self._starttime = time.perf_counter()
+            wait = self._starttime + times[self.position] - times[self._startframe] - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+        frame = self.reader.frame(self.position)
+        self.position += 1
+        if image is not None and image.shape == frame.shape:
+            image[...] = frame
+            return True, image
+        return True, np.array(frame)  # The chunk arrays are read only
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+        elif prop == cv2.CAP_PROP_POS_MSEC:
+            self.position = self.reader.find_time(value / 1000)
+        else:
+            return False
+        self._starttime = None
+        self._startframe = min(self.position, max(len(self.reader) - 1, 0))
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.reader.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.reader.shape[1] if len(self.reader.shape) > 1 else 0
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.reader.shape[0] if self.reader.shape else 0
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.reader)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return float(self.reader.times[self.position] * 1000) if self.position < len(self.reader) else 0
+        return 0
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
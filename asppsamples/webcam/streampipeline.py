@@ -0,0 +1,324 @@
+"""
+Instrumented streaming pipelines in the toolz style
+A Stage wraps one step of a generator chain, like c.map(func) or c.map(c.do(func)) in a tz.pipe, and
+counts what it does: items per second, latency percentiles of func, time spent waiting for items from
+upstream (idle, which includes the work of every stage before it), and for concurrent stages the depth
+of its queue and the time it was held up by a full queue (backpressure). Each stage runs
+    'inline'   - in the consumer's thread, like c.map
+    'thread'   - on its own thread, with at most maxsize results waiting in a queue
+    'process'  - in nworkers worker processes, at most maxsize items in flight. Numpy frames go through the
+                 shared memory slots of frameworkers.ProcessStage, other items through a process pool.
+                 func must be picklable
+Stages fit straight into tz.pipe, and Pipeline chains them and collects their metrics:
+
+    pipeline = Pipeline(Stage('rgb', convert_to_rgb),
+                        Stage('motion', detector, do=True, mode='thread'),
+                        Stage('intensity', engine),
+                        report_every=10)
+    for imageintensity in pipeline(ims):
+        ...
+    pipeline.report()             # table of every stage
+    pipeline.to_json('run.json')  # the same as json
+
+The twitter chains work the same way, e.g. scoring the tweets of a file in worker processes:
+
+    pipeline = Pipeline(Stage('polarity', textblob_polarity, mode='process', maxsize=64))
+    polarities = list(pipeline(get_text(get_twitter_data('twitterfeed.csv'))))
+"""
+import json
+import multiprocessing as mp
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from asppsamples.ringbuffer import RingSeries
+
+MODES = ('inline', 'thread', 'process')
+_DONE = object()
+
+
+class StageMetrics:
+    def __init__(self, name, mode, capacity=10000):
+        """
+        Counters of one stage
+        :param name: stage name
+        :param mode: 'inline', 'thread' or 'process'
+        :param capacity: number of recent items kept for the latency percentiles
+        """
+        self.name = name
+        self.mode = mode
+        self.items = 0
+        self.starttime = None
+        self.latency = RingSeries(capacity)  # seconds in func per item
+        self.idle = 0.0  # seconds waiting for the stage before
+        self.depth = 0  # results waiting in the queue, or items in flight
+        self.maxdepth = 0
+        self.waits = 0  # times the stage was held up by a full queue
+        self.waittime = 0.0
+
+    def start(self):
+        if self.starttime is None:
+            self.starttime = time.perf_counter()
+
+    def set_depth(self, depth):
+        self.depth = depth
+        if depth > self.maxdepth:
+            self.maxdepth = depth
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """
+        :return: dictionary with items, items per second, latency percentiles in milliseconds,
+                 idle and wait seconds and queue depth
+        """
+        elapsed = time.perf_counter() - self.starttime if self.starttime is not None else 0.0
+        s = {'mode': self.mode, 'items': self.items, 'per_second': self.items / elapsed if elapsed > 0 else 0.0,
+             'idle': self.idle, 'depth': self.depth, 'maxdepth': self.maxdepth, 'waits': self.waits,
+             'waittime': self.waittime}
+        s.update(self.latency.summary_ms(percentiles))
+        return s
+
+
+class _Timed:
+    def __init__(self, func):
+        """
+        Picklable wrapper that returns how long func took, for stages in worker processes
+        """
+        self.func = func
+
+    def __call__(self, item):
+        starttime = time.perf_counter()
+        result = self.func(item)
+        return result, time.perf_counter() - starttime
+
+
+class Stage:
+    def __init__(self, name, func, do=False, mode='inline', maxsize=4, nworkers=2):
+        """
+        :param name: name in the metrics
+        :param func: function applied to every item
+        :param do: pass the item on instead of func(item), like c.do
+        :param mode: 'inline', 'thread' or 'process'
+        :param maxsize: results waiting (thread) or items in flight (process) before the stage before it is held up
+        :param nworkers: worker processes in 'process' mode
+        """
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}, not {mode!r}')
+        if do and mode == 'process':
+            raise ValueError('A process stage cannot pass items on unchanged, func runs in another process')
+        self.name = name
+        self.func = func
+        self.do = do
+        self.mode = mode
+        self.maxsize = max(1, int(maxsize))
+        self.nworkers = nworkers
+        self.metrics = StageMetrics(name, mode)
+
+    def __call__(self, items):
+        """
+        Generator function, use it on an iterable as in tz.pipe(items, stage)
+        """
+        if self.mode == 'inline':
+            return self._inline(items)
+        if self.mode == 'thread':
+            return self._thread(items)
+        return self._process(items)
+
+    def _next(self, iterator):
+        """
+        :return: next item of iterator, or _DONE. The wait counts as idle time
+        """
+        starttime = time.perf_counter()
+        item = next(iterator, _DONE)
+        self.metrics.idle += time.perf_counter() - starttime
+        return item
+
+    def _apply(self, item):
+        starttime = time.perf_counter()
+        result = self.func(item)
+        self.metrics.latency.append(time.perf_counter() - starttime)
+        self.metrics.items += 1
+        return item if self.do else result
+
+    def _inline(self, items):
+        iterator = iter(items)
+        self.metrics.start()
+        while True:
+            item = self._next(iterator)
+            if item is _DONE:
+                return
+            yield self._apply(item)
+
+    def _thread(self, items):
+        results = queue.Queue(maxsize=self.maxsize)
+        stop = threading.Event()
+
+        def work():
+            try:
+                iterator = iter(items)
+                while not stop.is_set():
+                    item = self._next(iterator)
+                    if item is _DONE:
+                        break
+                    result = (True, self._apply(item))
+                    if results.full():  # Backpressure, the consumer is behind
+                        self.metrics.waits += 1
+                        starttime = time.perf_counter()
+                        while not stop.is_set():
+                            try:
+                                results.put(result, timeout=0.1)
+                                break
+                            except queue.Full:
+                                pass
+                        self.metrics.waittime += time.perf_counter() - starttime
+                    else:
+                        results.put(result)
+                    self.metrics.set_depth(results.qsize())
+            except Exception as e:
+                if not stop.is_set():
+                    results.put((False, e))
+                return
+            if not stop.is_set():  # Nobody reads the queue after stop
+                results.put((True, _DONE))
+
+        self.metrics.start()
+        worker = threading.Thread(target=work, name=f'Stage-{self.name}', daemon=True)
+        worker.start()
+        try:
+            while True:
+                ok, result = results.get()
+                self.metrics.set_depth(results.qsize())
+                if not ok:
+                    raise RuntimeError(f'Stage {self.name!r} failed') from result
+                if result is _DONE:
+                    return
+                yield result
+        finally:
+            stop.set()
+            # Unblock a worker waiting on the full queue. A worker still waiting for its upstream (a camera)
+            # is left behind, it is a daemon thread and stops at its next item
+            while True:
+                try:
+                    results.get_nowait()
+                except queue.Empty:
+                    break
+            worker.join(timeout=1.0)
+
+    def _process(self, items):
+        iterator = iter(items)
+        self.metrics.start()
+        first = self._next(iterator)
+        if first is _DONE:
+            return
+
+        def rest():
+            yield first
+            while True:
+                item = self._next(iterator)
+                if item is _DONE:
+                    return
+                yield item
+
+        if isinstance(first, np.ndarray):
+            from asppsamples.webcam.frameworkers import ProcessStage
+
+            # Frames are copied into shared memory slots, only the slot number goes to the worker
+            with ProcessStage(_Timed(self.func), nworkers=self.nworkers, nslots=self.maxsize) as stage:
+                for frame in rest():
+                    stage.submit(frame)
+                    self.metrics.set_depth(stage.stats()['inflight'])
+                    for result in stage.ready():
+                        yield self._record(result)
+                for result in stage.drain():
+                    yield self._record(result)
+            return
+
+        pool = mp.get_context().Pool(self.nworkers)
+        try:
+            inflight = deque()
+            timed = _Timed(self.func)
+            for item in rest():
+                inflight.append(pool.apply_async(timed, (item,)))
+                self.metrics.set_depth(len(inflight))
+                if len(inflight) >= self.maxsize:
+                    starttime = time.perf_counter()
+                    ready = inflight[0].ready()
+                    result = inflight.popleft().get()
+                    if not ready:  # Backpressure, waiting for the oldest item
+                        self.metrics.waits += 1
+                        self.metrics.waittime += time.perf_counter() - starttime
+                    yield self._record(result)
+            while inflight:
+                yield self._record(inflight.popleft().get())
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _record(self, timed):
+        result, seconds = timed
+        self.metrics.latency.append(seconds)
+        self.metrics.items += 1
+        return result
+
+
+class Pipeline:
+    def __init__(self, *stages, report_every=None, dump=None):
+        """
+        :param stages: Stage objects, in order
+        :param report_every: seconds between periodic metric dumps, None for none
+        :param dump: function called with the metrics dictionary for every dump, None prints the report
+        """
+        self.stages = list(stages)
+        self.report_every = report_every
+        self.dump = dump
+        self._lastdump = None
+
+    def __call__(self, items):
+        """
+        Generator function that runs items through every stage
+        """
+        stream = items
+        for stage in self.stages:
+            stream = stage(stream)
+        self._lastdump = time.perf_counter()
+        for item in stream:
+            yield item
+            if self.report_every is not None and time.perf_counter() - self._lastdump >= self.report_every:
+                self._lastdump = time.perf_counter()
+                if self.dump is None:
+                    self.report()
+                else:
+                    self.dump(self.metrics())
+
+    def metrics(self, percentiles=(50, 90, 99)):
+        """
+        :return: dictionary of stage name: summary of its metrics
+        """
+        return {stage.name: stage.metrics.summary(percentiles) for stage in self.stages}
+
+    def to_json(self, fname=None, percentiles=(50, 90, 99)):
+        """
+        :param fname: file to write, None to only return the text
+        :return: metrics as json text
+        """
+        text = json.dumps({'time': time.time(), 'stages': self.metrics(percentiles)}, indent=1)
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(text + '\n')
+        return text
+
+    def report(self, percentiles=(50, 90, 99)):
+        """
+        Print a table with one line per stage
+        """
+        m = self.metrics(percentiles)
+        columns = [f'p{q}' for q in percentiles] + ['mean']
+        print('{:>12}{:>8}{:>9}{:>8}'.format('stage', 'mode', 'items/s', 'idle s')
+              + ''.join('{:>9}'.format(col + ' ms') for col in columns) + '{:>7}{:>7}'.format('depth', 'waits'))
+        for name, s in m.items():
+            print('{:>12}{:>8}{:9.1f}{:8.2f}'.format(name, s['mode'], s['per_second'], s['idle'])
+                  + ''.join('{:9.3f}'.format(s.get(col, float('nan'))) for col in columns)
+                  + '{:>7}{:>7}'.format(s['maxdepth'], s['waits']))
+        return m
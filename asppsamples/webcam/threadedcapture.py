@@ -0,0 +1,177 @@
+"""
+Background capture stage for the webcam scripts
+A producer thread reads frames from the camera into a bounded ring of preallocated frame buffers,
+so camera I/O keeps running while matplotlib is busy drawing.
+ThreadedCapture looks like a cv2.VideoCapture (read, get, isOpened, release), so the existing
+stream_frames generators work with it unchanged.
+"""
+import threading
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ('drop-oldest', 'block')
+
+
+class ThreadedCapture:
+    def __init__(self, video_capture, maxsize=4, overflow='drop-oldest', late_after=None):
+        """
+        Start a producer thread that reads from video_capture into a ring of frame buffers
+        :param video_capture: the video capture object from opencv (or anything with read/release)
+        :param maxsize: number of captured frames that can wait for the consumer
+        :param overflow: what to do when the ring is full -
+                         'drop-oldest' overwrites the oldest waiting frame, 'block' pauses the camera reads
+        :param late_after: age in seconds after which a frame counts as late when it is handed out.
+                           Defaults to one frame period of the camera (or 1/30 s if the camera does not say)
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}, not {overflow!r}')
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.capture = video_capture
+        self.maxsize = maxsize
+        self.overflow = overflow
+        if late_after is None:
+            fps = self._camera_fps()
+            late_after = 1.0 / fps if fps > 0 else 1.0 / 30
+        self.late_after = late_after
+
+        # Counters
+        self.captured = 0  # frames read from the camera
+        self.delivered = 0  # frames handed to the consumer
+        self.dropped = 0  # frames overwritten before the consumer saw them
+        self.late = 0  # frames older than late_after when handed out
+
+        # maxsize frames waiting + one being written by the producer + one held by the consumer
+        self._slots = [None] * (maxsize + 2)
+        self._free = deque(range(maxsize + 2))
+        self._ready = deque()  # (slot, capture timestamp) in capture order
+        self._held = None  # slot the consumer is currently looking at
+        self._cond = threading.Condition()
+        self._running = True
+        self._finished = False  # producer is done with the camera: out of frames, failed or released
+        self._release = False  # producer releases the camera when it finishes
+        self._error = None  # exception raised by the camera read, raised again by read
+
+        self._thread = threading.Thread(target=self._produce, name='ThreadedCapture', daemon=True)
+        self._thread.start()
+
+    def _camera_fps(self):
+        try:
+            import cv2
+            return self.capture.get(cv2.CAP_PROP_FPS) or 0
+        except Exception:
+            return 0
+
+    def _take_slot(self):
+        """
+        Get a slot for the producer to write into, applying the overflow policy when the ring is full
+        :return: slot index, or None if the capture was stopped while waiting
+        """
+        with self._cond:
+            while len(self._ready) >= self.maxsize:
+                if not self._running:
+                    return None
+                if self.overflow == 'drop-oldest':
+                    slot, _ = self._ready.popleft()
+                    self.dropped += 1
+                    return slot
+                self._cond.wait()
+            return self._free.popleft()
+
+    def _produce(self):
+        slot = None
+        try:
+            while self._running:
+                slot = self._take_slot()
+                if slot is None:
+                    break
+
+                # Read straight into the preallocated buffer. Opencv reuses it when the shape matches
+                ret, frame = self.capture.read(self._slots[slot])
+                timestamp = time.perf_counter()
+
+                with self._cond:
+                    if not ret:
+                        break
+                    self._slots[slot] = frame
+                    self._ready.append((slot, timestamp))
+                    slot = None
+                    self.captured += 1
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                if slot is not None:  # Hand back the slot that was being written
+                    self._free.append(slot)
+                self._finished = True
+                release = self._release
+                self._cond.notify_all()
+            if release:
+                self.capture.release()
+
+    def read(self, image=None, timeout=None):
+        """
+        Get the oldest waiting frame, like cv2.VideoCapture.read
+        The returned array belongs to the ring and is recycled on the next call to read,
+        so copy it if you need to keep it for longer than one frame.
+        :param image: ignored, accepted for compatibility with cv2.VideoCapture.read
+        :param timeout: seconds to wait for a frame, None waits forever
+        :return: ret: False if no frame is available
+                 frame: bgr image or None
+        :raises: the exception of the camera read, once the frames captured before it were handed out
+        """
+        with self._cond:
+            # Give back the frame the consumer held since the last call
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+                self._cond.notify_all()
+
+            if not self._cond.wait_for(lambda: self._ready or self._finished or not self._running, timeout):
+                return False, None
+            if not self._ready:
+                if self._error is not None:
+                    raise self._error
+                return False, None
+
+            slot, timestamp = self._ready.popleft()
+            self._held = slot
+            self.delivered += 1
+            if time.perf_counter() - timestamp > self.late_after:
+                self.late += 1
+            return True, self._slots[slot]
+
+    def get(self, prop):
+        return self.capture.get(prop)
+
+    def isOpened(self):
+        return self._running and self.capture.isOpened()
+
+    def release(self, timeout=1.0):
+        """
+        Stop the producer thread and release the camera. If the producer is still inside a camera read
+        after timeout seconds, it releases the camera itself once the read returns
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        with self._cond:
+            if not self._finished:
+                self._release = True
+                return
+        self.capture.release()
+
+    def stats(self):
+        """
+        :return: dictionary with the capture counters
+        """
+        with self._cond:
+            return {'captured': self.captured, 'delivered': self.delivered,
+                    'dropped': self.dropped, 'late': self.late, 'waiting': len(self._ready)}
+
+    def print_stats(self):
+        s = self.stats()
+        print('Captured {captured} frames, delivered {delivered}, dropped {dropped}, late {late}'.format(**s))
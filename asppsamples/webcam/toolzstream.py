@@ -0,0 +1,173 @@
+"""
+Author : Seetha Krishnan
+Stream from webcam
+"""
+import argparse
+import cv2
+import toolz as tz
+from asppsamples.webcam.threadedcapture import ThreadedCapture
+from asppsamples.webcam.tracerenderer import TraceRenderer, setup_pyplot
+from asppsamples.ringbuffer import RingSeries
+from asppsamples.webcam.imageintensity import IntensityEngine
+from asppsamples.webcam.framesources import open_source
+from asppsamples.webcam.streampipeline import Pipeline, Stage
+from asppsamples.webcam.sessionrecorder import SessionRecorder, SessionSource
+from asppsamples.webcam.renderscheduler import RenderScheduler
+from asppsamples.webcam.motiondetection import MotionDetector
+from asppsamples.webcam.colorconversion import bgr_to_rgb_view
+
+
+def display_images(source=0, metrics=None, record=None, displayfps=30):
+    """
+    This function obtains results from generators and plot image and image intensity
+    :param source: frame source for open_source - camera number, video file, image folder, session or synthetic
+    :param metrics: json file for the stage metrics when streaming stops, None for none
+    :param record: folder to record the session to, None for no recording. Play it back with source='session:folder'
+    :param displayfps: most redraws per second, every frame is analyzed however slow drawing is
+    """
+    plt = setup_pyplot()  # TkAgg with a dark background, only imported when a window is opened
+    vc = setup_camera_and_plot(source)
+    ims = stream_frames(vc)  # Get the generator
+
+    fig, ax = plt.subplots(1, 2, figsize=(10, 5))
+    renderer = setup_plotting(imagestream=ims, imageaxis=ax[0], traceaxis=ax[1])
+
+    x_width = 50
+    history = RingSeries(capacity=x_width)  # Intensity of the last x_width frames
+    engine = IntensityEngine(mode='exact')  # Works on the bgr frame, no conversion needed for the mean
+    detector = MotionDetector()  # detector.last holds the motion of the latest frame
+    recorder = SessionRecorder(record, fps=vc.get(cv2.CAP_PROP_FPS), overflow='drop') if record else None
+
+    # Analysis runs on every frame, the scheduler draws the newest frame at display rate
+    scheduler = RenderScheduler(lambda frame: draw_frame(renderer, frame, history, detector.last), fps=displayfps)
+
+    # Every stage is timed, the idle time of the first stage is the wait for the camera. Drawing stays inline,
+    # matplotlib has to run on this thread
+    stages = [Stage('record', recorder.put, do=True)] if recorder is not None else []  # Written on a thread
+    pipeline = Pipeline(*stages,
+                        Stage('motion', detector, do=True),
+                        Stage('intensity', tz.compose(history.append, engine), do=True),
+                        Stage('render', lambda frame: scheduler.update(frame=frame), do=True),
+                        report_every=30)
+
+    try:
+        for i in pipeline(ims):
+            pass
+    except KeyboardInterrupt:
+        pass  # Stopped by hand, otherwise the video or session ended
+
+    scheduler.flush()
+    pipeline.report()
+    scheduler.report()
+    print('The collection FPS was {:0.2f}'.format(scheduler.stats()['analyzed_fps']))
+    if metrics is not None:
+        pipeline.to_json(metrics)
+    vc.release()
+    vc.print_stats()
+    if recorder is not None:
+        recorder.close()
+        recorder.report()
+
+
+def setup_plotting(imagestream, imageaxis, traceaxis):
+    """
+    Setup the plots
+    :param imagestream: generator function that streams images from webcam
+    :param imageaxis: axis where will be plotted
+    :param traceaxis: axis where intensity trace will be plotted
+    :return: renderer: TraceRenderer holding the image and intensity trace artists
+    """
+    # Plot a single image to the axis to create the image and trace artists
+    renderer = TraceRenderer(imageaxis=imageaxis, traceaxis=traceaxis, image=next(imagestream), threshold=40)
+    traceaxis.set_title('Blue: Above threshold, Red: Below threshold')
+    import matplotlib.pyplot as plt  # Set up by setup_pyplot in display_images
+    plt.show(block=False)
+
+    return renderer
+
+
+def setup_camera_and_plot(source=0):
+    """
+    Opens the webcam using open cv and finds the frame rate
+    The camera is read on a background thread so that plotting does not hold up the capture
+    :param source: frame source for open_source, 0 = First available camera
+    :return: capture: Capture object from opencv, wrapped in a ThreadedCapture
+    """
+    capture = open_source(source)  # Open webcam (or another frame source)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    print('Frames per second is {:0.2f}'.format(fps))
+
+    # A recorded session can wait for the plot, a camera cannot
+    overflow = 'block' if isinstance(capture, SessionSource) else 'drop-oldest'
+    return ThreadedCapture(capture, maxsize=4, overflow=overflow)
+
+
+def stream_frames(video_capture):
+    """
+    This generator function acquires images, convert to rgb, get mean intensity
+    and yield necessary results
+    :param  video_capture: the video capture object from opencv
+    :yield  RGB_image
+            Image Inensity
+    """
+    while True:
+        ok, frame = video_capture.read()  # Read image from webcam
+        if not ok:  # End of a video file or recorded session
+            return
+        small = cv2.resize(frame, (0, 0), fx=0.8, fy=0.8)
+        yield small
+
+
+def convert_to_rgb(frame):
+    """
+    :param frame: bgr image from opencv
+    :return: rgb image for matplotlib, a view of the same memory (set_data copies it)
+    """
+    return bgr_to_rgb_view(frame)
+
+
+def draw_frame(renderer, frame, series, motion=None):
+    """
+    Show a frame and the intensity trace up to it
+    :param renderer: TraceRenderer from setup_plotting
+    :param frame: bgr image
+    :param series: RingSeries holding the frame numbers and intensity of the plotting window
+    :param motion: MotionResult of the latest frame, shown in the image title
+    """
+    renderer.imagehandle.set_data(convert_to_rgb(frame))
+    plot_intensity(renderer=renderer, series=series, motion=motion)
+
+
+def plot_intensity(renderer, series, motion=None):
+    """
+    Update the intensity trace. The trace is red below the renderer threshold and blue above it
+    :param renderer: TraceRenderer from setup_plotting
+    :param series: RingSeries holding the frame numbers and intensity of the plotting window
+    :param motion: MotionResult of the latest frame, shown in the image title
+    """
+    title = None if motion is None else f'Motion {motion.magnitude:0.3f} ({len(motion.regions)} regions)'
+    renderer.update(series=series, title=title)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream from webcam and plot the image intensity')
+    parser.add_argument('--source', default='0',
+                        help='camera:0, video:file, images:folder, session:folder or synthetic:WxH@FPS:pattern')
+    parser.add_argument('--headless', action='store_true', help='measure the pipeline without a window')
+    parser.add_argument('--render', choices=('off', 'agg'), default='off', help='rendering in headless mode')
+    parser.add_argument('--frames', type=int, default=300, help='number of frames in headless mode')
+    parser.add_argument('--metrics', default=None, help='json file for the stage metrics')
+    parser.add_argument('--record', default=None, help='folder to record the session to')
+    parser.add_argument('--display-fps', type=float, default=30, help='most redraws per second')
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        from asppsamples.webcam.headless import run_headless
+        run_headless(source=args.source, nframes=args.frames, render=args.render)
+    else:
+        display_images(source=args.source, metrics=args.metrics, record=args.record,
+                       displayfps=args.display_fps)
+
+
+if __name__ == '__main__':
+    main()
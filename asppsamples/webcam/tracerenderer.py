@@ -0,0 +1,110 @@
+"""
+Blitting renderer for the webcam image and its intensity trace
+The image and the two threshold coloured traces are created once and then updated in place with
+set_data. Only these artists are redrawn on top of a saved background, so the cost of a frame
+does not grow with the length of the session.
+
+Importing this module does not import matplotlib. The display scripts call setup_pyplot when they open
+their window, so importing them (for stream_frames and the other helpers) does not pick a backend.
+"""
+
+
+def setup_pyplot(backend='TkAgg', style='dark_background'):
+    """
+    Import pyplot for the display scripts
+    :param backend: matplotlib backend, None to keep the current one
+    :param style: pyplot style, dark background for a prettier plot
+    :return: matplotlib.pyplot
+    """
+    import matplotlib
+    if backend is not None:
+        matplotlib.use(backend)
+    import matplotlib.pyplot as plt
+    if style is not None:
+        plt.style.use(style)
+    return plt
+
+
+class TraceRenderer:
+    def __init__(self, imageaxis, traceaxis, image, threshold=40, ylim=(0, 255)):
+        """
+        Create the image and trace artists
+        :param imageaxis: axis where webcam images are plotted
+        :param traceaxis: axis where the intensity trace is plotted
+        :param image: first rgb image, sets the size of the image artist
+        :param threshold: intensity below which the trace is drawn in red, None for a single blue trace
+        :param ylim: fixed intensity range of the trace axis
+        """
+        self.figure = imageaxis.figure
+        self.canvas = self.figure.canvas
+        self.traceaxis = traceaxis
+        self.threshold = threshold
+
+        # animated artists are left out of the normal draw, we draw them ourselves on every frame
+        self.imagehandle = imageaxis.imshow(image, animated=True)
+        imageaxis.axis('off')
+        self.title = imageaxis.set_title('', animated=True)
+        self.below, = traceaxis.plot([], [], '*-', color='r', markersize=5, animated=True)
+        self.above, = traceaxis.plot([], [], '.-', color='b', markersize=5, animated=True)
+        self.artists = [self.imagehandle, self.title, self.below, self.above]
+
+        traceaxis.set_ylim(ylim)
+        traceaxis.set_ylabel('Average Intensity')
+        traceaxis.set_xlabel('Frames')
+
+        self.fullredraws = 0  # number of times the whole figure had to be drawn
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        """
+        Called after every full draw (first frame, window resize, new x range).
+        Saves the static part of the figure and puts the animated artists back on top
+        """
+        self.fullredraws += 1
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self.artists:
+            self.figure.draw_artist(artist)
+
+    def _update_xlim(self, xdata):
+        """
+        The x axis is moved a whole window at a time, so the background only has to be redrawn
+        once every window width frames instead of on every frame
+        :return: True if the x range changed
+        """
+        xmin, xmax = self.traceaxis.get_xlim()
+        if xdata[0] >= xmin and xdata[-1] <= xmax:
+            return False
+        width = max(xdata[-1] - xdata[0], 1)
+        self.traceaxis.set_xlim((xdata[0], xdata[-1] + width))
+        return True
+
+    def update(self, series, image=None, title=None):
+        """
+        Draw one frame
+        :param series: RingSeries with the frame numbers and intensity of the trace
+        :param image: new rgb image, or None to keep the current one
+        :param title: new title for the image axis
+        """
+        if image is not None:
+            self.imagehandle.set_data(image)
+        if title is not None:
+            self.title.set_text(title)
+
+        # Change color of plot if intensity decreases below a threshold
+        xdata = series.x
+        if self.threshold is None:
+            self.above.set_data(xdata, series.y)
+        else:
+            below, above = series.split(self.threshold)
+            self.below.set_data(xdata, below)
+            self.above.set_data(xdata, above)
+
+        if (len(xdata) and self._update_xlim(xdata)) or self._background is None:
+            self.canvas.draw()  # full draw, _on_draw saves the new background
+        else:
+            self.canvas.restore_region(self._background)
+            for artist in self.artists:
+                self.figure.draw_artist(artist)
+            self.canvas.blit(self.figure.bbox)
+        self.canvas.flush_events()
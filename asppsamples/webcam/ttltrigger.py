@@ -0,0 +1,269 @@
+"""
+Low latency threshold trigger for the arduino TTL pulse
+The trigger path runs on its own thread: it reads a frame, computes the intensity and, if the threshold
+trigger fires, writes the pulse to the serial device straight away. Plotting only gets a copy of the
+latest frame and never holds up the trigger.
+The time from the frame arriving to the pulse being written is recorded in latency histograms.
+
+python -m asppsamples.webcam.ttltrigger runs the trigger path against a pseudo-terminal standing in for the arduino.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from asppsamples.webcam.imageintensity import IntensityEngine
+
+
+class ThresholdTrigger:
+    def __init__(self, threshold=10, hysteresis=2.0, debounce=2):
+        """
+        Fires once when the intensity drops below threshold, and re-arms only after the intensity
+        has come back above threshold + hysteresis
+        :param threshold: intensity below which the trigger fires
+        :param hysteresis: extra intensity needed above threshold to re-arm
+        :param debounce: number of frames in a row that must be past the threshold before the state changes
+        """
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.debounce = max(1, int(debounce))
+        self.armed = True
+        self.fired = 0
+        self._count = 0  # frames in a row past the threshold
+
+    def update(self, imageintensity):
+        """
+        :param imageintensity: intensity of the newest frame
+        :return: True if the trigger fires on this frame
+        """
+        if self.armed:
+            past = imageintensity < self.threshold
+        else:
+            past = imageintensity > self.threshold + self.hysteresis
+        self._count = self._count + 1 if past else 0
+        if self._count < self.debounce:
+            return False
+
+        self._count = 0
+        self.armed = not self.armed
+        if not self.armed:
+            self.fired += 1
+            return True
+        return False
+
+
+class LatencyHistogram:
+    def __init__(self, maxms=50.0, binms=0.1):
+        """
+        Fixed bins, so recording a latency is one array increment
+        :param maxms: latencies above this go into the last bin
+        :param binms: width of a bin in milliseconds
+        """
+        self.binms = binms
+        self.counts = np.zeros(int(np.ceil(maxms / binms)) + 1, dtype=np.int64)
+        self.maxseen = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        self.counts[min(int(ms / self.binms), len(self.counts) - 1)] += 1
+        if ms > self.maxseen:
+            self.maxseen = ms
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def percentile(self, q):
+        """
+        :param q: percentile, 0 to 100
+        :return: upper edge of the bin holding that percentile, in milliseconds, at most the largest latency
+        """
+        total = self.total()
+        if not total:
+            return float('nan')
+        index = np.searchsorted(np.cumsum(self.counts), q / 100 * total)
+        return min((index + 1) * self.binms, self.maxseen)
+
+    def summary(self):
+        return {'count': self.total(), 'p50': self.percentile(50), 'p90': self.percentile(90),
+                'p99': self.percentile(99), 'max': self.maxseen}
+
+
+def open_serial(port, baudrate=9600, **kwargs):
+    """
+    Open the serial device of the arduino (needs pyserial)
+    :param port: device name, for example '/dev/ttyACM0' or 'COM3'
+    :param baudrate: baud rate set in the arduino sketch
+    :return: serial port object with write and flush
+    """
+    import serial
+    return serial.Serial(port, baudrate=baudrate, **kwargs)
+
+
+def open_pty_standin():
+    """
+    Create a pseudo-terminal to stand in for the arduino (linux and macOS)
+    Open the returned port name with open_serial, and read what was written from the master
+    :return: master: file descriptor of the arduino side
+             port: device name of the computer side
+    """
+    master, slave = os.openpty()
+    port = os.ttyname(slave)
+    import tty
+    tty.setraw(slave)  # No line buffering or echo, every byte goes straight through
+    os.close(slave)
+    return master, port
+
+
+class TriggerPath(threading.Thread):
+    def __init__(self, video_capture, trigger, port=None, pulse=b'1', engine=None):
+        """
+        Thread that reads frames, checks the threshold and sends the pulse
+        :param video_capture: opencv capture object or any frame source
+        :param trigger: ThresholdTrigger
+        :param port: serial port object (open_serial), None prints instead of sending
+        :param pulse: bytes written to the port when the trigger fires
+        :param engine: IntensityEngine, defaults to exact intensity
+        """
+        super().__init__(name='TriggerPath', daemon=True)
+        self.capture = video_capture
+        self.trigger = trigger
+        self.port = port
+        self.pulse = pulse
+        self.engine = engine or IntensityEngine(mode='exact')
+
+        self.decision = LatencyHistogram()  # frame arrival to threshold decision, every frame
+        self.pulses = LatencyHistogram()  # frame arrival to pulse written, fired frames only
+        self.framecount = 0
+        self.pulsetimes = []  # perf_counter time of every pulse
+
+        self._running = True
+        self._done = False  # run has finished with the capture
+        self._release = False  # run releases the capture when it finishes
+        self._cond = threading.Condition()
+        # Three frame buffers, so the trigger thread never writes into the frame being plotted:
+        # the thread copies into _back and swaps it with _front, latest swaps _front with _reading
+        self._back = None
+        self._front = None
+        self._reading = None
+        self._fresh = False  # _front holds a frame latest has not handed out yet
+        self._latestintensity = None
+        self._latestcount = 0
+
+    def run(self):
+        while self._running:
+            ret, frame = self.capture.read()
+            arrived = time.perf_counter()
+            if not ret:
+                break
+
+            imageintensity = self.engine(frame)
+            if self.trigger.update(imageintensity):
+                if self.port is None:
+                    print('ZERO!!!')
+                else:
+                    self.port.write(self.pulse)
+                    self.port.flush()
+                sent = time.perf_counter()
+                self.pulses.record(sent - arrived)
+                self.pulsetimes.append(sent)
+            self.decision.record(time.perf_counter() - arrived)
+            self.framecount += 1
+
+            # Hand a copy of the frame to the plotting side, after the trigger is done
+            if self._back is None or self._back.shape != frame.shape:
+                self._back = np.empty_like(frame)
+            np.copyto(self._back, frame)
+            with self._cond:
+                self._front, self._back = self._back, self._front
+                self._fresh = True
+                self._latestintensity = imageintensity
+                self._latestcount = self.framecount
+                self._cond.notify_all()
+
+        with self._cond:
+            self._running = False
+            self._done = True
+            release = self._release
+            self._cond.notify_all()
+        if release:
+            self.capture.release()
+
+    def latest(self, after=0, timeout=1.0):
+        """
+        Wait for a frame newer than after
+        The image is a buffer the trigger thread does not write into. It is reused by the next call,
+        so use it, or copy it, before calling latest again
+        :param after: frame number that was already seen
+        :param timeout: seconds to wait
+        :return: framecount, image, intensity - or None if no new frame arrived
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latestcount > after or not self._running, timeout):
+                return None
+            if self._latestcount <= after:
+                return None
+            if self._fresh:
+                self._reading, self._front = self._front, self._reading
+                self._fresh = False
+            return self._latestcount, self._reading, self._latestintensity
+
+    def stop(self, timeout=1.0):
+        """
+        Stop the thread and release the capture. If the thread is still waiting for a frame after
+        timeout seconds, it releases the capture itself once the read returns
+        """
+        self._running = False
+        self.join(timeout=timeout)
+        with self._cond:
+            if not self._done:
+                self._release = True
+                return
+        self.capture.release()
+
+    def report(self):
+        print('Trigger path: {} frames, {} pulses'.format(self.framecount, self.trigger.fired))
+        for name, histogram in (('decision', self.decision), ('pulse', self.pulses)):
+            s = histogram.summary()
+            if s['count']:
+                print('{:>9} latency (ms): p50 {p50:0.2f}  p90 {p90:0.2f}  p99 {p99:0.2f}  max {max:0.2f}'.format(
+                    name, **s))
+
+
+def run_pty_check(nframes=120, period=1.0, fps=60):
+    """
+    Run the trigger path on blinking synthetic frames against a pseudo-terminal and
+    check that every dark phase sends exactly one pulse
+    :param nframes: number of frames
+    :param period: seconds per bright/dark cycle of the synthetic frames
+    :param fps: frame rate of the synthetic frames
+    :return: True if the pulses read from the pseudo-terminal match the dark phases
+    """
+    from asppsamples.webcam.framesources import SyntheticSource
+
+    master, portname = open_pty_standin()
+    port = open_serial(portname)
+    source = SyntheticSource(320, 240, fps=fps, pattern='blink', period=period, low=5, high=200,
+                             nframes=nframes, realtime=True)
+    path = TriggerPath(source, ThresholdTrigger(threshold=10, debounce=1), port=port)
+    path.start()
+    path.join()
+    port.close()
+
+    os.set_blocking(master, False)
+    try:
+        received = os.read(master, 4096)
+    except BlockingIOError:
+        received = b''
+    os.close(master)
+
+    brightness = np.array([source.brightness(n) for n in range(nframes)])
+    expected = int(np.count_nonzero(np.diff((brightness < 10).astype(int), prepend=0) == 1))
+    path.report()
+    print('Pulses expected {}, read from the pseudo-terminal {}'.format(expected, received.count(path.pulse)))
+    return received.count(path.pulse) == expected
+
+
+if __name__ == '__main__':
+    ok = run_pty_check()
+    print('OK' if ok else 'MISMATCH')
@@ -0,0 +1,68 @@
+import argparse
+import cv2
+import datetime
+from asppsamples.webcam.tracerenderer import TraceRenderer, setup_pyplot
+from asppsamples.ringbuffer import RingSeries
+# Install pyserial to connect with arduino
+from asppsamples.webcam.ttltrigger import ThresholdTrigger, TriggerPath, open_serial
+
+
+def stream_frames(trigger_path):
+    # The trigger path reads the camera, frames for plotting are copies of the newest frame
+    count = 0
+    while True:
+        latest = trigger_path.latest(after=count)
+        if latest is None:
+            return
+        count, frame, imageintensity = latest
+        yield count, frame, imageintensity
+
+
+def display_images(maxtime, threshold=10, serialport=None):
+    plt = setup_pyplot()  # TkAgg with a dark background
+    video_capture = cv2.VideoCapture(0)
+    port = open_serial(serialport) if serialport else None  # No port prints instead of sending the pulse
+    # Threshold check and ttl pulse run right after capture, on their own thread
+    trigger_path = TriggerPath(video_capture, ThresholdTrigger(threshold=threshold, hysteresis=2, debounce=2),
+                               port=port)
+    trigger_path.start()
+
+    starttime = datetime.datetime.now()
+    intensity = RingSeries(capacity=300)
+    figure, ax = plt.subplots(1, 2, figsize=(10, 5))
+    renderer = None
+    for count, frame, imageintensity in stream_frames(trigger_path):
+        elapsed = (datetime.datetime.now() - starttime).total_seconds()
+        intensity.append(imageintensity, x=count)
+        if renderer is None:
+            renderer = TraceRenderer(imageaxis=ax[0], traceaxis=ax[1], image=frame, threshold=threshold)
+            plt.tight_layout()
+            plt.show(block=False)
+        plot_image_and_brightness(renderer, frame, intensity, count)
+        if elapsed > maxtime:
+            break
+
+    trigger_path.stop()
+    trigger_path.report()
+    if port is not None:
+        port.close()
+    plt.close('all')
+
+
+def plot_image_and_brightness(renderer, image, imageintensity, framecount):
+    renderer.update(series=imageintensity, image=image, title=f'Frame Number {framecount}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plot the webcam and send a ttl pulse when it gets dark')
+    parser.add_argument('--seconds', type=float, default=10, help='capture time in seconds')
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='intensity below which a ttl pulse is sent to the arduino')
+    parser.add_argument('--port', default=None,
+                        help="serial device of the arduino, for example '/dev/ttyACM0' or 'COM3'")
+    args = parser.parse_args(argv)
+    display_images(maxtime=args.seconds, threshold=args.threshold, serialport=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+"""
+Benchmark suite for the frame and tweet hot paths
+Every benchmark runs on generated data, so runs on the same machine can be compared:
+    frames  - SyntheticSource noise frames at several resolutions
+    tweets  - feeds of any number of rows made from the tweets in twitterfeed.csv, in the layout the stream
+              listener writes (Tweet, Hashtag, UserLocation, LocationX, LocationY, DateCreated, NumberofRetweets).
+              They are written to benchdata/ once and reused
+Each benchmark is run repeat times. The best time, the median and the items (frames or rows) per second
+go into a json file, and a run can be compared with a baseline saved earlier on the same machine:
+
+    python benchmarks.py --save-baseline                   # run everything, store as benchmark-baseline.json
+    python benchmarks.py                                   # run again and compare, exit status 1 on a regression
+    python benchmarks.py --quick --only intensity          # small data, only the names containing 'intensity'
+    python benchmarks.py --rows 1000000 --only tweets      # tweet paths on a million rows
+"""
+import argparse
+import contextlib
+import csv
+import functools
+import importlib.util
+import io
+import json
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATADIR = os.path.join(HERE, 'benchdata')
+BASELINE = os.path.join(HERE, 'benchmark-baseline.json')
+SOURCE_FEED = os.path.join(HERE, 'twitterfeed.csv')
+
+RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+ROWS = (10000, 100000)
+COUNTRIES = ['USA', 'India', 'UK', 'Australia', 'Canada', 'Nigeria', 'Pakistan', 'Ireland', 'London', 'California']
+FEED_HEADER = ['Tweet', 'Hashtag', 'UserLocation', 'LocationX', 'LocationY', 'DateCreated', 'NumberofRetweets']
+_HASHTAG = re.compile(r'#(\w+)')
+_WORDS = {'good': 1.0, 'great': 1.0, 'love': 1.0, 'happy': 1.0, 'best': 1.0,
+          'bad': -1.0, 'sad': -1.0, 'hate': -1.0, 'worst': -1.0, 'slow': -1.0}
+
+
+@functools.lru_cache(maxsize=4)
+def synthetic_frames(width, height, nframes, distinct=8, seed=0):
+    """
+    :param distinct: number of different frames, the list goes through them in turn to save memory
+    :return: list of nframes bgr noise frames
+    """
+    from asppsamples.webcam.framesources import SyntheticSource
+
+    source = SyntheticSource(width=width, height=height, pattern='noise', nframes=distinct, seed=seed)
+    frames = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            break
+        frames.append(frame.copy())
+    return [frames[i % len(frames)] for i in range(nframes)]
+
+
+def make_feed(nrows, fname=None, source=SOURCE_FEED, geofraction=0.3, seed=0):
+    """
+    Write a feed of nrows tweets, made by going through the tweets of source again and again
+    :param nrows: number of tweets
+    :param fname: file to write, None for benchdata/feed-<nrows>-s<seed>-g<geofraction>.csv.
+                  An existing file is reused, so the name must change with the parameters
+    :param source: recorded feed with Tweet, UserLocation and NumberofRetweets columns
+    :param geofraction: fraction of the tweets given coordinates
+    :param seed: seed of the coordinates
+    :return: name of the file
+    """
+    from asppsamples.twitter.hashtagcounter import encode_hashtags
+
+    fname = fname or os.path.join(DATADIR, f'feed-{nrows}-s{seed}-g{geofraction}.csv')
+    if os.path.exists(fname):
+        return fname
+    os.makedirs(os.path.dirname(fname) or '.', exist_ok=True)
+
+    with open(source, 'r', newline='', encoding='utf-8') as f:
+        rows = csv.reader(f)
+        header = next(rows)
+        text, location, retweets = (header.index(name) for name in ('Tweet', 'UserLocation', 'NumberofRetweets'))
+        tweets = [(row[text], row[location], row[retweets]) for row in rows if len(row) == len(header)]
+
+    rng = np.random.default_rng(seed)
+    starttime = datetime(2017, 12, 13, 11, 0, 0)
+    partial = fname + '.partial'  # Renamed when complete, so an interrupted run is not reused
+    with open(partial, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FEED_HEADER)
+        for start in range(0, nrows, 10000):
+            n = min(10000, nrows - start)
+            hasxy = rng.random(n) < geofraction
+            x, y = rng.uniform(-180, 180, n), rng.uniform(-60, 70, n)
+            lines = []
+            for i in range(n):
+                tweet, location, retweet = tweets[(start + i) % len(tweets)]
+                created = starttime + timedelta(seconds=(start + i) // 10)  # Ten tweets a second
+                lines.append([tweet, encode_hashtags(_HASHTAG.findall(tweet)), location,
+                              x[i] if hasxy[i] else '', y[i] if hasxy[i] else '',
+                              created.strftime('%Y-%m-%d %H:%M:%S'), retweet])
+            writer.writerows(lines)
+    os.replace(partial, fname)
+    return fname
+
+
+def lexicon_polarity(text):
+    """
+    Stand-in scorer when textblob is not installed: mean of the scores of a few words
+    """
+    scores = [_WORDS[w] for w in re.findall(r'[a-z]+', text.lower()) if w in _WORDS]
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def _scorer():
+    if importlib.util.find_spec('textblob') is None:
+        return lexicon_polarity
+    from asppsamples.twitter.sentimentengine import textblob_polarity
+    return textblob_polarity
+
+
+def time_case(func, repeat=5):
+    """
+    :param func: function without arguments, returns the number of items it handled
+    :param repeat: number of runs
+    :return: dictionary with best and median seconds, items and items per second of the best run
+    """
+    times = []
+    items = 0
+    for _ in range(repeat):
+        starttime = time.perf_counter()
+        items = func()
+        times.append(time.perf_counter() - starttime)
+    best = min(times)
+    return {'best_s': best, 'median_s': float(np.median(times)), 'items': items,
+            'per_second': items / best if best > 0 else 0.0}
+
+
+# Frame benchmarks, every function returns the number of frames it handled
+
+def _stream_frames(width, height, nframes):
+    from asppsamples.webcam.framesources import SyntheticSource
+    from asppsamples.webcam.toolzstream import stream_frames
+
+    source = SyntheticSource(width=width, height=height, pattern='noise', nframes=nframes)
+    return sum(1 for _ in stream_frames(source))
+
+
+def _convert(frames, method):
+    from asppsamples.webcam.colorconversion import convert_bgr_to_rgb
+
+    out = np.empty_like(frames[0])
+    for frame in frames:
+        convert_bgr_to_rgb(frame, method=method, out=out)
+    return len(frames)
+
+
+def _intensity(frames, mode):
+    from asppsamples.webcam.imageintensity import IntensityEngine
+
+    engine = IntensityEngine(mode=mode)
+    for frame in frames:
+        engine(frame)
+    return len(frames)
+
+
+def _render(frames, scheduled):
+    """
+    :return: function that draws the frames with a TraceRenderer on the Agg backend, every one
+             or through a RenderScheduler at 30 FPS. The figure is made here, outside the timing
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from asppsamples.webcam.colorconversion import bgr_to_rgb_view
+    from asppsamples.webcam.imageintensity import frame_intensity
+    from asppsamples.webcam.renderscheduler import RenderScheduler
+    from asppsamples.ringbuffer import RingSeries
+    from asppsamples.webcam.tracerenderer import TraceRenderer
+
+    _, ax = plt.subplots(1, 2, figsize=(10, 5))
+    renderer = TraceRenderer(imageaxis=ax[0], traceaxis=ax[1], image=bgr_to_rgb_view(frames[0]), threshold=40)
+    history = RingSeries(capacity=50)
+
+    def draw():
+        scheduler = RenderScheduler(lambda image: renderer.update(series=history, image=image), fps=30)
+        for frame in frames:
+            history.append(frame_intensity(frame))
+            if scheduled:
+                scheduler.update(image=bgr_to_rgb_view(frame))
+            else:
+                renderer.update(series=history, image=bgr_to_rgb_view(frame))
+        return len(frames)
+
+    return draw
+
+
+def frame_cases(resolutions=RESOLUTIONS, nframes=100):
+    """
+    :return: list of (name, setup) of the frame benchmarks. setup makes the data and returns the
+             function to time, so only the selected benchmarks make data
+    """
+    from asppsamples.webcam.colorconversion import METHODS
+
+    cases = []
+    for width, height in resolutions:
+        size = f'{width}x{height}'
+        frames = functools.partial(synthetic_frames, width, height, nframes)
+        cases.append((f'frames/stream_frames/{size}',
+                      lambda w=width, h=height: functools.partial(_stream_frames, w, h, nframes)))
+        for method in METHODS:
+            cases.append((f'frames/convert_bgr_to_rgb/{method}/{size}',
+                          lambda f=frames, m=method: functools.partial(_convert, f(), m)))
+        for mode in ('exact', 'subsample'):
+            cases.append((f'frames/intensity/{mode}/{size}',
+                          lambda f=frames, m=mode: functools.partial(_intensity, f(), m)))
+    width, height = resolutions[0]
+    for name, scheduled in (('every_frame', False), ('scheduled_30fps', True)):
+        cases.append((f'frames/render/{name}/{width}x{height}',
+                      lambda s=scheduled: _render(synthetic_frames(width, height, nframes), s)))
+    return cases
+
+
+# Tweet benchmarks, every function returns the number of rows it handled
+
+def _read(fname):
+    from asppsamples.twitter.tweetfeed import get_twitter_data
+    return sum(1 for _ in get_twitter_data(fname)) - 1
+
+
+def _read_cache(fname):
+    from asppsamples.twitter.tweetcache import get_twitter_data
+    return sum(1 for _ in get_twitter_data(fname)) - 1
+
+
+def _read_location(fname):
+    from asppsamples.twitter.tweetfeed import get_twitter_data, get_userlocation
+    return sum(1 for _ in get_userlocation(get_twitter_data(fname))) - 1
+
+
+def _read_location_cache(fname):
+    from asppsamples.twitter.tweetcache import read_column
+    return sum(1 for _ in read_column(fname, 'UserLocation')) - 1
+
+
+def _count_locations(fname):
+    from asppsamples.twitter.locationmatcher import count_tweets_by_location
+    from asppsamples.twitter.tweetfeed import get_twitter_data, get_userlocation
+
+    with contextlib.redirect_stdout(io.StringIO()):  # It prints the counts
+        count_tweets_by_location(get_userlocation(get_twitter_data(fname)), COUNTRIES)
+    return _nrows(fname)
+
+
+def _count_locations_parallel(fname):
+    from asppsamples.twitter.parallelcsv import count_tweets_by_location
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        count_tweets_by_location(fname, COUNTRIES)
+    return _nrows(fname)
+
+
+def _sentiment(fname, scorer):
+    from asppsamples.twitter.sentimentengine import SentimentEngine
+    from asppsamples.twitter.tweetfeed import get_text, get_twitter_data
+
+    texts = get_text(get_twitter_data(fname))
+    next(texts)  # Header
+    with SentimentEngine(scorer=scorer) as engine:  # A new engine, the cache starts empty
+        _, polarity = engine.score(texts)
+    return len(polarity)
+
+
+def _hashtags(fname):
+    from asppsamples.twitter.hashtagcounter import count_hashtags
+    from asppsamples.twitter.tweetfeed import get_hashtags, get_twitter_data
+
+    count_hashtags(get_hashtags(get_twitter_data(fname)), k=200)
+    return _nrows(fname)
+
+
+def _nrows(fname):
+    return int(os.path.basename(fname).split('-')[1].split('.')[0])
+
+
+@functools.lru_cache(maxsize=None)
+def _feed(nrows):
+    from asppsamples.twitter.tweetcache import open_cache
+
+    fname = make_feed(nrows)
+    open_cache(fname).close()  # Build the cache once, the benchmarks read a warm cache
+    return fname
+
+
+def tweet_cases(rows=ROWS):
+    """
+    :return: list of (name, setup) of the tweet benchmarks, see frame_cases
+    """
+    scorer = _scorer()
+    cases = []
+    for nrows in rows:
+        for name, func in ((f'get_twitter_data/{nrows}', _read),
+                           (f'get_twitter_data/cache/{nrows}', _read_cache),
+                           (f'get_userlocation/{nrows}', _read_location),
+                           (f'get_userlocation/cache/{nrows}', _read_location_cache),
+                           (f'count_tweets_by_location/{nrows}', _count_locations),
+                           (f'count_tweets_by_location/parallel/{nrows}', _count_locations_parallel),
+                           (f'sentiment/{scorer.__name__}/{nrows}', functools.partial(_sentiment, scorer=scorer)),
+                           (f'hashtags/{nrows}', _hashtags)):
+            cases.append(('tweets/' + name, lambda n=nrows, f=func: functools.partial(f, _feed(n))))
+    return cases
+
+
+def environment():
+    """
+    :return: dictionary describing the machine and library versions, stored with the results
+    """
+    import cv2
+
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'opencv': cv2.__version__,
+            'machine': platform.machine(), 'system': platform.system(), 'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def run_benchmarks(only=None, quick=False, rows=None, repeat=5, verbose=True):
+    """
+    :param only: run only the benchmarks whose name contains this text
+    :param quick: small frames and feeds, for checking the suite itself
+    :param rows: feed sizes of the tweet benchmarks, None for ROWS (2000 with quick)
+    :param repeat: runs of every benchmark
+    :param verbose: print every result as it comes
+    :return: dictionary with the environment and the result of every benchmark
+    """
+    resolutions = RESOLUTIONS[:1] if quick else RESOLUTIONS
+    nframes = 20 if quick else 100
+    rows = rows or ((2000,) if quick else ROWS)
+    if quick:
+        repeat = min(repeat, 3)
+
+    results = {}
+    for name, setup in frame_cases(resolutions, nframes) + tweet_cases(rows):
+        if only is not None and only not in name:
+            continue
+        results[name] = time_case(setup(), repeat)
+        if verbose:
+            r = results[name]
+            print('{:<56}{:10.2f} ms{:12.0f} /s'.format(name, r['best_s'] * 1000, r['per_second']))
+    return {'environment': environment(), 'quick': quick, 'repeat': repeat, 'results': results}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    :param results: output of run_benchmarks
+    :param baseline: earlier output of run_benchmarks
+    :param tolerance: allowed slow-down of the best time, 0.2 is 20 percent
+    :return: list of dictionaries with name, baseline and current seconds, ratio and status
+             ('ok', 'faster', 'REGRESSION', 'new', or 'other size' when the baseline handled a different
+             number of frames or rows, for example with --quick, and the times are not compared)
+    """
+    rows = []
+    for name, r in results['results'].items():
+        before = baseline['results'].get(name)
+        if before is None or before['items'] != r['items']:
+            rows.append({'name': name, 'baseline_s': None, 'best_s': r['best_s'], 'ratio': None,
+                         'status': 'new' if before is None else 'other size'})
+            continue
+        ratio = r['best_s'] / before['best_s'] if before['best_s'] > 0 else float('inf')
+        status = 'REGRESSION' if ratio > 1 + tolerance else 'faster' if ratio < 1 / (1 + tolerance) else 'ok'
+        rows.append({'name': name, 'baseline_s': before['best_s'], 'best_s': r['best_s'], 'ratio': ratio,
+                     'status': status})
+    return rows
+
+
+def print_comparison(rows):
+    print('{:<56}{:>12}{:>12}{:>9}  {}'.format('benchmark', 'baseline ms', 'now ms', 'ratio', 'status'))
+    for r in rows:
+        if r['baseline_s'] is None:
+            print('{:<56}{:>12}{:12.2f}{:>9}  {}'.format(r['name'], '-', r['best_s'] * 1000, '-', r['status']))
+        else:
+            print('{:<56}{:12.2f}{:12.2f}{:9.2f}  {}'.format(r['name'], r['baseline_s'] * 1000, r['best_s'] * 1000,
+                                                             r['ratio'], r['status']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the frame and tweet hot paths')
+    parser.add_argument('--out', default='benchmark-results.json', help='json file for the results')
+    parser.add_argument('--baseline', default=BASELINE, help='results to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slow-down, 0.2 is 20 percent')
+    parser.add_argument('--only', default=None, help='run only the benchmarks whose name contains this')
+    parser.add_argument('--rows', type=int, nargs='+', default=None, help='feed sizes of the tweet benchmarks')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of every benchmark')
+    parser.add_argument('--quick', action='store_true', help='small data, to check the suite runs')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(only=args.only, quick=args.quick, rows=args.rows, repeat=args.repeat)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=1)
+    print('Results written to {}'.format(args.out))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print('Baseline written to {}'.format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print('No baseline {}, store one with --save-baseline'.format(args.baseline))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('quick') != results['quick']:
+        print('The baseline was made with{} --quick, only benchmarks of the same size are compared'.format(
+            '' if baseline.get('quick') else 'out'))
+    rows = compare(results, baseline, tolerance=args.tolerance)
+    print_comparison(rows)
+    regressions = [r['name'] for r in rows if r['status'] == 'REGRESSION']
+    if regressions:
+        print('{} regressions: {}'.format(len(regressions), ', '.join(regressions)))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
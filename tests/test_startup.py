@@ -0,0 +1,14 @@
+"""
+Import time budget of the package and the scripts, see asppsamples/startup.py
+"""
+from asppsamples.startup import check_startup
+
+
+def test_startup_budget():
+    results = check_startup()
+    # Modules of the package must import, scripts missing a dependency here are skipped
+    missing = [r['module'] for r in results if r['seconds'] is None and r['module'].startswith('asppsamples')]
+    failed = ['{module}: {seconds:.3f} s of {budget:.3f} s, imports {loaded}'.format(**r)
+              for r in results if r['ok'] is False]
+    assert not missing, f'Package modules that do not import: {missing}'
+    assert not failed, 'Over the startup budget:\n' + '\n'.join(failed)
@@ -3,61 +3,50 @@ Exercise2 : Solution
 
 """
 import cv2
-import numpy as np
-import matplotlib
 import time
-
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-
-plt.style.use('dark_background')  # Dark background for a prettier plot
+from asppsamples.webcam.threadedcapture import ThreadedCapture
+from asppsamples.webcam.tracerenderer import TraceRenderer, setup_pyplot
+from asppsamples.webcam.renderscheduler import RenderScheduler
+from asppsamples.ringbuffer import RingSeries
+from asppsamples.webcam.imageintensity import frame_intensity
+from asppsamples.webcam.motiondetection import MotionDetector
+from asppsamples.webcam.colorconversion import bgr_to_rgb_view
 
 
 def display_images():
     """
     This function obtains results from generators and plot image and image intensity
     """
+    plt = setup_pyplot()  # TkAgg with a dark background for a prettier plot
     vc = cv2.VideoCapture(0)  # Open webcam using opencv 0 = First available camera
     fps = vc.get(cv2.CAP_PROP_FPS)
     print('Frames per second is {:0.2f}'.format(fps))
+    vc = ThreadedCapture(vc, maxsize=4, overflow='drop-oldest')  # Read camera on a background thread
     figure, ax = plt.subplots(1, 2, figsize=(10, 5))
     count = 0
-    intensity = []
-    frametime = []
-
-    # Define some plot parameters
-    ax[1].set_xlabel('Frames')
-    ax[1].set_ylabel('Average Intensity')
+    detector = MotionDetector()
+    intensity = RingSeries(capacity=int(fps) if fps > 0 else 30)  # Keep one second of intensity for plotting
 
     starttime = time.time()
     while vc.isOpened():
         try:
-            for i in stream_frames(vc):
+            for i in stream_frames(vc, detector):
                 # i[0] : rgb image
                 # i[1] : intensity of image
+                # i[2] : motion in the image
 
-                # Add to a list for plotting a stream and delete when done.
-                # Not the prettiest way to do this - Any better ideas?
-                intensity.append(i[1])
-                frametime.append(count)
+                # Add to the ring buffer for plotting a stream, the oldest values are overwritten
+                intensity.append(i[1], x=count)
 
-                if count == 0:
-                    im = plot_img(image=i[0], framecount=count, AxisHandle=ax[0])  # Plot axis for first frame
-                else:
-                    plot_img(image=i[0], framecount=count, AxisHandle=ax[0],
-                             ImageHandle=im)  # Add data to axis for subsequent frames to speed up plotting
+                if count == 0:  # Create the image and trace artists with the first frame
+                    renderer = TraceRenderer(imageaxis=ax[0], traceaxis=ax[1], image=i[0], threshold=50)
+                    # Every frame is analyzed, the newest one is drawn at most 30 times a second
+                    scheduler = RenderScheduler(lambda **state: plot_intensitytrace(renderer=renderer, **state),
+                                                fps=30)
+                    plt.show(block=False)
 
                 # Change color of intensity trace if image intensity is lower than a threshold
-                plot_intensitytrace(axis=ax[1], xdata=frametime, imageintensity=intensity, framecount=count,
-                                    framespersec=fps, threshold=50)
-
-                # Stuff to show and stream plot
-                plt.show(block=False)
-                plt.pause(0.001)
-
-                if len(intensity) > fps:  # Reduce list size, if you are not going to do anything with it
-                    intensity = delete_list(intensity, fps)
-                    frametime = delete_list(frametime, fps)
+                scheduler.update(image=i[0], series=intensity, framecount=count, motion=i[2])
 
                 count += 1
 
@@ -67,72 +56,57 @@ def display_images():
         except KeyboardInterrupt:
             elapsedtime = time.time() - starttime
             print('The collection FPS was {:0.2f}'.format(count / elapsedtime))
+            scheduler.report()
+            print('Motion detection took {:0.2f} ms on the last frame, {} frames over budget'.format(
+                detector.lastms, detector.overbudget))
             vc.release()
+            vc.print_stats()
             break
 
 
-def delete_list(list, todelete):
-    i = 0
-    while i < todelete - 1:
-        del list[0]
-        i += 1
-    return list
-
-
-# def motiondetection(image):
+def motiondetection(image, detector):
+    """
+    This function scores the motion in an image against the detector's running background
+    :param  image: bgr image
+            detector: MotionDetector, keeps the background between frames
+    :return: MotionResult with the motion magnitude and the moving regions
+    """
+    return detector(image)
 
 
-def stream_frames(video_capture):
+def stream_frames(video_capture, detector):
     """
-    This generator function acquires images, convert to rgb, get mean intensity
+    This generator function acquires images, convert to rgb, get mean intensity and motion
     and yield necessary results
     :param  video_capture: the video capture object from opencv
+            detector: MotionDetector for the motion stage
     :yield  RGB_image
             Image Intensity
+            Motion
     """
-    _, frame = video_capture.read()  # Read image from webcam
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # Convert to rgb
-    intensity = np.mean(rgb)  # Get mean intensity
-    yield rgb, intensity
+    ret, frame = video_capture.read()  # Read image from webcam
+    if not ret:  # Camera failed or the source ended, releasing it ends the while loop in display_images
+        video_capture.release()
+        return
+    intensity = frame_intensity(frame)  # Get mean intensity, channel order does not matter for the mean
+    motion = motiondetection(frame, detector)
+    rgb = bgr_to_rgb_view(frame)  # Convert to rgb for plotting, a view without copying
+    yield rgb, intensity, motion
 
 
-def plot_img(image, framecount, **kwargs):
-    """
-    This function plots image from the webcam
-    :param  image: rgb image
-            framecount: present frame number
-
-    :kwargs AxisHandle: figure axis for plotting
-            ImageHandle: image axis to plot all subsequent
-                        frames after the first frame
-    """
-
-    kwargs['AxisHandle'].set_title(f'Frame Number {framecount}')
-    if 'ImageHandle' in kwargs.keys():  # For all other frames
-        kwargs['ImageHandle'].set_data(image)
-    else:  # For first frame
-        im = kwargs['AxisHandle'].imshow(image)
-        kwargs['AxisHandle'].axis('off')
-        return im
-
-
-def plot_intensitytrace(axis, xdata, imageintensity, framecount, framespersec, threshold):
+def plot_intensitytrace(renderer, image, series, framecount, motion):
     """
     This function plots image and intensity of image through time
-    :param  axis: figure axis for plotting
-            imageintensity: intensity of image
+    The artists are created once by the TraceRenderer and only their data is changed here
+    :param  renderer: TraceRenderer holding the image and trace artists
+            image: rgb image
+            series: RingSeries with the frame numbers and intensity of image
             framecount: present frame number
-            framepersec: Frames per second of camera to fix window width
-            threshold: itensity threshold below which plot colors are changed
+            motion: MotionResult of the frame
     """
-    xdata = np.array(xdata)
-    imageintensity = np.array(imageintensity)
-
-    # Change color of plot if intensity decreases below a threshold
-    axis.plot(xdata[imageintensity < threshold], imageintensity[imageintensity < threshold], '*-', color='r')
-    axis.plot(xdata[imageintensity > threshold], imageintensity[imageintensity > threshold], '.-', color='b')
-
-    axis.set_xlim((framecount - framespersec, framecount))  # Keep window size a one second
+    renderer.update(series=series, image=image,
+                    title=f'Frame Number {framecount}, motion {motion.magnitude:0.3f} ({len(motion.regions)} regions)')
 
 
-display_images()
+if __name__ == '__main__':
+    display_images()